@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    Outbound pipeline allocation benchmark. Replays the path of one message
+    from `SockJSConnection.send` to the bytes written to the socket for every
+    transport frame format, using the old str based pipeline (str templates,
+    utf-8 encoding on write) and the bytes pipeline used by sockjs-tornado.
+
+    Message is JSON-encoded once up front, so only framing and encoding of
+    the result is measured. Reports time per message, peak memory allocated
+    per message and number of memory blocks allocated per message which are
+    still alive once the frame is built (tracemalloc snapshot difference).
+
+    Usage: python allocations.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+
+from sockjs.tornado import proto
+
+
+PAYLOAD = {'symbol': 'ABCD', 'bid': 101.25, 'ask': 101.5, 'seq': 12345,
+           'text': u'Привет, мир'}
+
+codec = proto.default_codec
+
+
+def utf8(s):
+    # What tornado does with str passed to `RequestHandler.write`
+    return s.encode('utf-8')
+
+
+STR_FRAMES = {
+    'websocket': lambda m: utf8('a[%s]' % m),
+    'xhr': lambda m: utf8('a[%s]' % m + '\n'),
+    'eventsource': lambda m: utf8('data: ' + 'a[%s]' % m + '\r\n\r\n'),
+    'htmlfile': lambda m: utf8('<script>\np(%s);\n</script>\r\n' % codec.encode('a[%s]' % m)),
+    'jsonp': lambda m: utf8('%s(%s);\r\n' % ('cb', codec.encode('a[%s]' % m))),
+}
+
+BYTES_FRAMES = {
+    'websocket': lambda m: proto.MESSAGES % m,
+    'xhr': lambda m: proto.MESSAGES % m + b'\n',
+    'eventsource': lambda m: b'data: ' + proto.MESSAGES % m + b'\r\n\r\n',
+    'htmlfile': lambda m: b'<script>\np(%s);\n</script>\r\n' % codec.encode_bytes(
+        (proto.MESSAGES % m).decode('utf-8')),
+    'jsonp': lambda m: b'%s(%s);\r\n' % (b'cb', codec.encode_bytes(
+        (proto.MESSAGES % m).decode('utf-8'))),
+}
+
+
+def measure(frame, msg, iterations):
+    t = time.time()
+    for n in range(iterations):
+        frame(msg)
+    elapsed = time.time() - t
+
+    tracemalloc.start()
+    peak = 0
+    for n in range(iterations):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        frame(msg)
+        peak += tracemalloc.get_traced_memory()[1] - base
+
+    # Keep frames alive, so their blocks show up in the second snapshot
+    frames = [None] * iterations
+    before = tracemalloc.take_snapshot()
+    for n in range(iterations):
+        frames[n] = frame(msg)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    return (elapsed / iterations * 1000000, float(peak) / iterations,
+            float(blocks) / iterations)
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for name in sorted(STR_FRAMES):
+        print(name)
+
+        for label, frames, msg in (('str', STR_FRAMES, codec.encode(PAYLOAD)),
+                                   ('bytes', BYTES_FRAMES, codec.encode_bytes(PAYLOAD))):
+            us, peak, blocks = measure(frames[name], msg, iterations)
+            print('    %-6s %8.3f us/msg %8.1f bytes peak/msg %6.2f allocs/msg' % (
+                  label, us, peak, blocks))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    Broadcast benchmark. Opens N websocket clients to the local server and
+    compares time spent in `SockJSRouter.broadcast` (one prepared frame for
+    all websocket clients) with per-client `write_message` calls.
+
+    With `deflate` argument, clients negotiate permessage-deflate with server
+    no-context-takeover: per-client sends compress message for each client,
+    `broadcast` compresses it once.
+
+    Usage: python broadcast.py [clients] [message size] [deflate]
+
+    50k clients need around 100k file descriptors, raise `ulimit -n` first.
+"""
+import sys
+import time
+
+from tornado import web, ioloop, gen, websocket
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from sockjs.tornado import SockJSRouter, SockJSConnection, proto
+
+
+class BroadcastConnection(SockJSConnection):
+    clients = set()
+
+    def on_open(self, info):
+        self.clients.add(self)
+
+    def on_message(self, msg):
+        pass
+
+    def on_close(self):
+        self.clients.discard(self)
+
+
+def per_client(clients, msg):
+    """Broadcast without prepared frames"""
+    json_msg = proto.json_encode(msg)
+
+    for c in clients:
+        c.session.send_jsonified(json_msg, False)
+
+
+@gen.coroutine
+def receive(conns, count):
+    for ws in conns:
+        for n in range(count):
+            yield ws.read_message()
+
+
+@gen.coroutine
+def run(count, size, deflate):
+    settings = dict()
+    compression_options = None
+
+    if deflate:
+        settings.update(websocket_compression=True,
+                        websocket_server_no_context_takeover=True)
+        compression_options = dict()
+
+    router = SockJSRouter(BroadcastConnection, '/broadcast', settings)
+
+    sockets = bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    server = HTTPServer(web.Application(router.urls))
+    server.add_sockets(sockets)
+
+    url = 'ws://127.0.0.1:%d/broadcast/0/%%d/websocket' % port
+
+    conns = []
+    for n in range(count):
+        ws = yield websocket.websocket_connect(url % n,
+                                               compression_options=compression_options)
+        # Skip open frame
+        yield ws.read_message()
+        conns.append(ws)
+
+    clients = list(BroadcastConnection.clients)
+    # Somewhat compressible payload
+    msg = ''.join(chr(ord('a') + (n * n) % 26) for n in range(size))
+
+    for name, func in (('per client', per_client),
+                       ('prepared', router.broadcast)):
+        t = time.time()
+        func(clients, msg)
+        elapsed = time.time() - t
+
+        yield receive(conns, 1)
+        total = time.time() - t
+
+        print('%-10s %d clients, %d bytes: broadcast call %8.2f ms, delivered in %8.2f ms' % (
+              name, count, size, elapsed * 1000, total * 1000))
+
+    for ws in conns:
+        ws.close()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    deflate = len(sys.argv) > 3 and sys.argv[3] == 'deflate'
+
+    ioloop.IOLoop.current().run_sync(lambda: run(count, size, deflate))
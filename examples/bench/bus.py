@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+    Broadcast bus benchmark. Spawns N local worker processes connected with
+    `sockjs.tornado.bus.BroadcastBus`. First worker publishes timestamped
+    messages, other workers measure latency until message reaches their local
+    publish path.
+
+    Usage: python bus.py [workers] [messages]
+"""
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+from tornado import ioloop, gen
+
+from sockjs.tornado import SockJSRouter, SockJSConnection, proto
+from sockjs.tornado.bus import BroadcastBus
+
+
+class NullConnection(SockJSConnection):
+    def on_message(self, msg):
+        pass
+
+
+class LatencyBus(BroadcastBus):
+    """Bus which records delivery latency"""
+    def __init__(self, *args, **kwargs):
+        super(LatencyBus, self).__init__(*args, **kwargs)
+        self.latency = []
+        self.expected = 0
+
+    def on_message(self, topic, json_msg):
+        super(LatencyBus, self).on_message(topic, json_msg)
+
+        msg = proto.json_decode(json_msg)
+        self.latency.append(time.time() - msg['ts'])
+
+        if len(self.latency) == self.expected:
+            ioloop.IOLoop.current().stop()
+
+
+def worker(path, worker_id, workers, messages, results):
+    router = SockJSRouter(NullConnection, '/bus')
+
+    bus = LatencyBus(router, path, worker_id, workers, reconnect_interval=100)
+    bus.expected = messages
+    bus.start()
+
+    @gen.coroutine
+    def publish():
+        # Wait for all workers
+        while len(bus._peers) < workers - 1:
+            yield gen.sleep(0.1)
+
+        # And give them time to connect to each other
+        yield gen.sleep(0.5)
+
+        for n in range(messages):
+            router.publish('bench', {'ts': time.time(), 'n': n})
+
+            # Let messages go out one by one
+            if n % 100 == 0:
+                yield gen.moment
+
+        yield gen.sleep(0.5)
+        ioloop.IOLoop.current().stop()
+
+    if worker_id == 0:
+        ioloop.IOLoop.current().add_callback(publish)
+
+    ioloop.IOLoop.current().start()
+
+    if worker_id != 0:
+        results.put(bus.latency)
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    path = tempfile.mkdtemp()
+    results = multiprocessing.Queue()
+
+    procs = [multiprocessing.Process(target=worker,
+                                     args=(path, n, workers, messages, results))
+             for n in range(workers)]
+
+    for p in procs:
+        p.start()
+
+    latency = []
+    for n in range(workers - 1):
+        latency.extend(results.get())
+
+    for p in procs:
+        p.join()
+
+    shutil.rmtree(path)
+
+    latency.sort()
+    count = len(latency)
+
+    print('%d workers, %d messages: delivered %d, avg %.3f ms, p50 %.3f ms, p99 %.3f ms, max %.3f ms' % (
+          workers, messages, count,
+          sum(latency) / count * 1000,
+          latency[count // 2] * 1000,
+          latency[int(count * 0.99)] * 1000,
+          latency[-1] * 1000))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+    permessage-deflate benchmark. Compresses a stream of typical SockJS data
+    frames the same way websocket transport does and reports CPU time, bytes
+    saved and zlib memory per connection for different compression settings.
+
+    - ctx: compression context is kept between messages (default)
+    - no_ctx: server_no_context_takeover, new compressor for each message
+
+    Usage: python deflate.py [messages] [message_size]
+"""
+import sys
+import time
+import zlib
+import random
+import tracemalloc
+
+from sockjs.tornado import proto
+
+
+LEVELS = [1, 3, 6, 9]
+MEM_LEVELS = [8, 4, 1]
+
+
+def make_messages(count, size):
+    rnd = random.Random(0)
+
+    messages = []
+    for n in range(count):
+        items = []
+        while len(proto.json_encode(items)) < size:
+            items.append({'symbol': 'SYM%d' % rnd.randint(0, 50),
+                          'bid': round(rnd.uniform(10, 200), 2),
+                          'ask': round(rnd.uniform(10, 200), 2),
+                          'seq': n})
+        messages.append(proto.MESSAGES % proto.json_encode(items).encode('ascii'))
+    return messages
+
+
+def compress(compressor, data):
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def run(messages, level, mem_level, persistent):
+    def create():
+        return zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, mem_level)
+
+    compressor = create()
+    total = 0
+
+    t = time.time()
+    for msg in messages:
+        if not persistent:
+            compressor = create()
+        # Trailing 0x00 0x00 0xff 0xff is not sent
+        total += len(compress(compressor, msg)) - 4
+    elapsed = time.time() - t
+
+    return elapsed, total
+
+
+def memory(level, mem_level, message):
+    """zlib memory held by one connection compressor"""
+    tracemalloc.start()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, mem_level)
+    compress(compressor, message)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    messages = make_messages(count, size)
+    raw = sum(len(m) for m in messages)
+
+    print('%d messages, %d bytes average' % (count, raw // count))
+    print('%-6s %-4s %-7s %10s %8s %12s %12s' % (
+          'level', 'mem', 'context', 'us/msg', 'ratio', 'saved/msg', 'memory/conn'))
+
+    for level in LEVELS:
+        for mem_level in MEM_LEVELS:
+            mem = memory(level, mem_level, messages[0])
+
+            for persistent in (True, False):
+                elapsed, total = run(messages, level, mem_level, persistent)
+
+                print('%-6d %-4d %-7s %10.2f %8.3f %12.1f %12s' % (
+                      level, mem_level, 'ctx' if persistent else 'no_ctx',
+                      elapsed / count * 1000000,
+                      float(total) / raw,
+                      float(raw - total) / count,
+                      # Without context takeover compressor is freed after
+                      # each message
+                      '%d KB' % (mem // 1024) if persistent else '-'))
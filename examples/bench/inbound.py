@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+    Inbound decode benchmark. Compares the old xhr_send and jsonp_send body
+    handling (decode body to str, unquote str, parse) with the current one
+    (parse received bytes or memoryview, unquote bytes only when needed) for
+    large batched posts.
+
+    Usage: python inbound.py [size_kb] [iterations]
+"""
+import sys
+import time
+
+from sockjs.tornado import proto
+from sockjs.tornado.util import bytes_to_str, unquote_plus, unquote_plus_bytes
+
+
+def make_body(size):
+    msg = '{"symbol":"ABCD","bid":101.25,"ask":101.5,"seq":12345}'
+    batch = []
+    while len(batch) * (len(msg) + 10) < size:
+        batch.append(msg)
+    return proto.json_encode(batch).encode('utf-8')
+
+
+def quote_form(body):
+    # Same escaping browsers apply to the jsonp_send form field
+    out = []
+    for c in bytearray(body):
+        if c == 0x20:
+            out.append('+')
+        elif c < 0x80 and (chr(c).isalnum() or chr(c) in '-_.*'):
+            out.append(chr(c))
+        else:
+            out.append('%%%02X' % c)
+    return ('d=' + ''.join(out)).encode('ascii')
+
+
+def old_xhr(codec, body):
+    return codec.decode(bytes_to_str(body))
+
+
+def new_xhr(codec, body):
+    return codec.decode(body)
+
+
+def old_jsonp(codec, body):
+    return codec.decode(unquote_plus(bytes_to_str(body)[2:]))
+
+
+def new_jsonp(codec, body):
+    if b'%' in body or b'+' in body:
+        return codec.decode(unquote_plus_bytes(body[2:]))
+    return codec.decode(memoryview(body)[2:])
+
+
+def run(func, codec, body, iterations):
+    t = time.time()
+    for n in range(iterations):
+        func(codec, body)
+    return (time.time() - t) / iterations * 1000000
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 65536
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    body = make_body(size)
+
+    cases = [
+        ('xhr_send', body, old_xhr, new_xhr),
+        ('jsonp_send d=', b'd=' + body, old_jsonp, new_jsonp),
+        ('jsonp_send quoted', quote_form(body), old_jsonp, new_jsonp),
+    ]
+
+    for name, data, old, new in cases:
+        print('%s (%d bytes)' % (name, len(data)))
+
+        for codec_name in sorted(proto.CODECS):
+            codec = proto.CODECS[codec_name]
+            print('    %-10s old %9.1f us/op  new %9.1f us/op' % (
+                  codec_name,
+                  run(old, codec, data, iterations),
+                  run(new, codec, data, iterations)))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+    Static responses benchmark. Starts the server in a child process and
+    reports requests per second and server CPU time per request for /info
+    and /iframe.html, served by pre-rendered handlers and by handlers which
+    render the response for each request, like earlier releases did.
+
+    Usage: python info.py [requests] [concurrency]
+"""
+import sys
+import time
+import random
+import hashlib
+import datetime
+import multiprocessing
+
+from tornado import web, ioloop, gen, httpclient
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from sockjs.tornado import SockJSRouter, SockJSConnection, static
+from sockjs.tornado.basehandler import CACHE_TIME
+from sockjs.tornado.util import MAXSIZE, str_to_bytes
+
+
+class EchoConnection(SockJSConnection):
+    def on_message(self, msg):
+        self.send(msg)
+
+
+def render_cache_headers(handler):
+    handler.set_header('Cache-Control', 'max-age=%d, public' % CACHE_TIME)
+
+    d = datetime.datetime.now() + datetime.timedelta(seconds=CACHE_TIME)
+    handler.set_header('Expires', d.strftime('%a, %d %b %Y %H:%M:%S'))
+
+    handler.set_header('access-control-max-age', CACHE_TIME)
+
+
+class RenderedInfoHandler(static.InfoHandler):
+    def get(self):
+        self.preflight()
+        self.disable_cache()
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+
+        options = dict(websocket=self.server.websockets_enabled,
+                       cookie_needed=self.server.cookie_needed,
+                       origins=['*:*'],
+                       entropy=random.randint(0, MAXSIZE))
+
+        self.write(self.server.codec.encode(options))
+
+
+class RenderedIFrameHandler(static.IFrameHandler):
+    def get(self):
+        data = str_to_bytes(static.IFRAME_TEXT % self.server.settings['sockjs_url'])
+        hsh = hashlib.md5(data).hexdigest()
+
+        render_cache_headers(self)
+
+        self.set_header('Etag', hsh)
+        self.write(data)
+
+
+class CPUHandler(web.RequestHandler):
+    def get(self):
+        self.write(repr(time.process_time()))
+
+
+def serve(sockets):
+    router = SockJSRouter(EchoConnection, '/echo')
+
+    app = web.Application(router.urls + [
+        (r'/rendered/info', RenderedInfoHandler, dict(server=router)),
+        (r'/rendered/iframe.html', RenderedIFrameHandler, dict(server=router)),
+        (r'/cpu', CPUHandler)
+    ])
+
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+    ioloop.IOLoop.current().start()
+
+
+@gen.coroutine
+def run(base, path, count, concurrency):
+    client = httpclient.AsyncHTTPClient(max_clients=concurrency)
+
+    @gen.coroutine
+    def worker(n):
+        for _ in range(n):
+            yield client.fetch(base + path)
+
+    response = yield client.fetch(base + '/cpu')
+    cpu = float(response.body)
+    t = time.time()
+
+    yield [worker(count // concurrency) for _ in range(concurrency)]
+
+    elapsed = time.time() - t
+    response = yield client.fetch(base + '/cpu')
+    cpu = float(response.body) - cpu
+
+    total = count // concurrency * concurrency
+    print('%-24s %8.1f requests/s, server CPU %6.1f us/request' % (
+          path, total / elapsed, cpu / total * 1000000))
+
+
+@gen.coroutine
+def main(base, count, concurrency):
+    for path in ('/rendered/info', '/echo/info',
+                 '/rendered/iframe.html', '/echo/iframe.html'):
+        yield run(base, path, count, concurrency)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    sockets = bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+
+    child = multiprocessing.Process(target=serve, args=(sockets,))
+    child.start()
+
+    try:
+        base = 'http://127.0.0.1:%d' % port
+        ioloop.IOLoop.current().run_sync(lambda: main(base, count, concurrency))
+    finally:
+        child.terminate()
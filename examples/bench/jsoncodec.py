@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+    JSON codec benchmark. Runs available `sockjs.tornado.proto` codecs on the
+    frame shapes used by sockjs-tornado:
+
+    - `Session.send_message`: encoding of the outgoing message string
+    - `WebSocketTransport.on_message`: decoding of the websocket frame
+    - `XhrSendHandler.post`: decoding of the batched xhr_send body
+
+    Usage: python jsoncodec.py [iterations]
+"""
+import sys
+import time
+
+from sockjs.tornado import proto
+
+
+PAYLOAD = '{"symbol":"ABCD","bid":101.25,"ask":101.5,"seq":12345}'
+
+SHAPES = [
+    ('send_message', 'encode', PAYLOAD),
+    ('send_message unicode', 'encode', u'Привет ' + PAYLOAD),
+    ('websocket on_message', 'decode', proto.json_encode([PAYLOAD]).encode('utf-8')),
+    ('xhr_send batch', 'decode', proto.json_encode([PAYLOAD] * 50).encode('utf-8')),
+]
+
+
+def run(codec, method, data, iterations):
+    func = getattr(codec, method)
+
+    t = time.time()
+    for n in range(iterations):
+        func(data)
+    return time.time() - t
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    for name, method, data in SHAPES:
+        print('%s (%s, %d bytes)' % (name, method, len(data)))
+
+        for codec_name in sorted(proto.CODECS):
+            elapsed = run(proto.CODECS[codec_name], method, data, iterations)
+            print('    %-10s %8.3f us/op' % (codec_name, elapsed / iterations * 1000000))
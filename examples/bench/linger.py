@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+    Polling linger benchmark. Runs N xhr-polling clients against the local
+    server, which sends a message to every client each `interval` ms, and
+    reports polling requests per second and messages per request for
+    different `polling_linger` values.
+
+    Usage: python linger.py [clients] [interval_ms] [seconds]
+"""
+import sys
+import time
+
+from tornado import web, ioloop, gen, httpclient
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from sockjs.tornado import SockJSRouter, SockJSConnection
+
+
+LINGERS = [0, 10, 50, 100]
+
+
+class FeedConnection(SockJSConnection):
+    clients = set()
+
+    def on_open(self, info):
+        self.clients.add(self)
+
+    def on_message(self, msg):
+        pass
+
+    def on_close(self):
+        self.clients.discard(self)
+
+
+@gen.coroutine
+def poll(client, url, deadline, counters):
+    while time.time() < deadline:
+        response = yield client.fetch(url, method='POST', body='')
+
+        counters['requests'] += 1
+        # Count messages in a[...] frames
+        if response.body.startswith(b'a'):
+            counters['messages'] += response.body.count(b'"m"')
+
+
+@gen.coroutine
+def run(count, interval, seconds, linger):
+    FeedConnection.clients = set()
+
+    router = SockJSRouter(FeedConnection, '/feed', dict(polling_linger=linger,
+                                                        polling_linger_size=None))
+
+    sockets = bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    server = HTTPServer(web.Application(router.urls))
+    server.add_sockets(sockets)
+
+    client = httpclient.AsyncHTTPClient(max_clients=count)
+    url = 'http://127.0.0.1:%d/feed/0/%%d/xhr' % port
+
+    # Open sessions
+    for n in range(count):
+        yield client.fetch(url % n, method='POST', body='')
+
+    feed = ioloop.PeriodicCallback(lambda: router.broadcast(FeedConnection.clients, 'm'),
+                                   interval)
+    feed.start()
+
+    counters = dict(requests=0, messages=0)
+    deadline = time.time() + seconds
+
+    yield [poll(client, url % n, deadline, counters) for n in range(count)]
+
+    feed.stop()
+    server.stop()
+
+    # Let outstanding linger windows expire
+    yield gen.sleep(linger / 1000.0 + 0.1)
+
+    raise gen.Return(counters)
+
+
+@gen.coroutine
+def main(count, interval, seconds):
+    for linger in LINGERS:
+        counters = yield run(count, interval, seconds, linger)
+
+        print('linger %4d ms: %8.1f requests/s, %6.2f messages/request' % (
+              linger,
+              counters['requests'] / float(seconds),
+              counters['messages'] / float(max(counters['requests'], 1))))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    interval = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    seconds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    ioloop.IOLoop.current().run_sync(lambda: main(count, interval, seconds))
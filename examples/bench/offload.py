@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+    Executor offload benchmark. N websocket clients send messages which take
+    CPU-bound work to handle. Reports IOLoop lag (how late a 10ms timer
+    fires) while messages are handled in `on_message` on the IOLoop and in
+    thread and process pools via `SockJSConnection.executor`.
+
+    Pure Python work holds the GIL, so thread pool keeps the lag lower than
+    inline handlers only thanks to GIL switching. Process pool keeps it flat.
+
+    Usage: python offload.py [clients] [messages per client] [work]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from tornado import web, ioloop, gen, websocket
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from sockjs.tornado import SockJSRouter, SockJSConnection
+
+
+WORK = 200000
+
+
+def render(message):
+    """CPU-bound work"""
+    n = int(message)
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+class InlineConnection(SockJSConnection):
+    def on_message(self, message):
+        self.send(render(message))
+
+
+class ThreadConnection(SockJSConnection):
+    executor = None
+
+    @staticmethod
+    def process_message(message):
+        return render(message)
+
+
+class ProcessConnection(SockJSConnection):
+    executor = None
+
+    @staticmethod
+    def process_message(message):
+        return render(message)
+
+
+class LagProbe(object):
+    """Records how late 10ms timer fires"""
+    def __init__(self):
+        self.samples = []
+        self._running = False
+
+    @gen.coroutine
+    def run(self):
+        self._running = True
+        io_loop = ioloop.IOLoop.current()
+
+        while self._running:
+            deadline = io_loop.time() + 0.01
+            yield gen.sleep(0.01)
+            self.samples.append(io_loop.time() - deadline)
+
+    def stop(self):
+        self._running = False
+
+    def report(self):
+        # Run might finish before the first timer fires
+        samples = sorted(self.samples) or [0]
+        return (samples[len(samples) // 2] * 1000,
+                samples[int(len(samples) * 0.99)] * 1000,
+                samples[-1] * 1000)
+
+
+@gen.coroutine
+def run(name, conn_class, clients, count, work):
+    router = SockJSRouter(conn_class, '/offload')
+
+    sockets = bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    server = HTTPServer(web.Application(router.urls))
+    server.add_sockets(sockets)
+
+    url = 'ws://127.0.0.1:%d/offload/0/%%d/websocket' % port
+
+    conns = []
+    for n in range(clients):
+        ws = yield websocket.websocket_connect(url % n)
+        # Skip open frame
+        yield ws.read_message()
+        conns.append(ws)
+
+    @gen.coroutine
+    def client(ws):
+        for n in range(count):
+            ws.write_message('[%d]' % work)
+
+        received = 0
+        while received < count:
+            msg = yield ws.read_message()
+            if msg.startswith('a'):
+                received += msg.count(',') + 1
+
+    probe = LagProbe()
+    probe.run()
+
+    t = time.time()
+    yield [client(ws) for ws in conns]
+    elapsed = time.time() - t
+
+    probe.stop()
+
+    for ws in conns:
+        ws.close()
+    server.stop()
+
+    median, p99, worst = probe.report()
+    print('%-8s %6.2f s, %7.1f messages/s, loop lag median %7.2f ms, p99 %7.2f ms, max %7.2f ms' % (
+          name, elapsed, clients * count / elapsed, median, p99, worst))
+
+
+@gen.coroutine
+def main(clients, count, work):
+    yield run('inline', InlineConnection, clients, count, work)
+    yield run('threads', ThreadConnection, clients, count, work)
+    yield run('process', ProcessConnection, clients, count, work)
+
+
+if __name__ == '__main__':
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    work = int(sys.argv[3]) if len(sys.argv) > 3 else WORK
+
+    ThreadConnection.executor = ThreadPoolExecutor(4)
+    ProcessConnection.executor = ProcessPoolExecutor(4)
+
+    # Start worker processes before measurements
+    ProcessConnection.executor.submit(render, 0).result()
+
+    ioloop.IOLoop.current().run_sync(lambda: main(clients, count, work), timeout=600)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+    URL routing benchmark. Mounts several SockJS routers with all transports
+    enabled in one application and reports time Tornado spends to find the
+    handler for typical SockJS requests, with `SockJSRouter.urls` regular
+    expressions and with `sockjs.tornado.dispatcher.SockJSDispatcher`.
+
+    Usage: python routing.py [routers] [iterations]
+"""
+import sys
+import time
+
+from tornado import web, httputil
+
+from sockjs.tornado import SockJSRouter, SockJSConnection
+from sockjs.tornado.dispatcher import SockJSDispatcher
+
+
+PATHS = ['/%s/000/session/xhr',
+         '/%s/000/session/xhr_send',
+         '/%s/000/session/websocket',
+         '/%s/000/session/htmlfile',
+         '/%s/info',
+         '/%s/iframe.html',
+         '/index.html']
+
+
+class EchoConnection(SockJSConnection):
+    def on_message(self, msg):
+        self.send(msg)
+
+
+class IndexHandler(web.RequestHandler):
+    def get(self):
+        self.write('index')
+
+
+def make_apps(count):
+    routers = [SockJSRouter(EchoConnection, '/router%d' % n) for n in range(count)]
+
+    urls = []
+    for router in routers:
+        urls.extend(router.urls)
+
+    regex_app = web.Application(urls + [(r'/index.html', IndexHandler)])
+
+    dispatch_app = SockJSDispatcher.create_application(routers,
+                                                       [(r'/index.html', IndexHandler)])
+
+    return regex_app, dispatch_app
+
+
+def run(app, requests, iterations):
+    t = time.time()
+
+    for _ in range(iterations):
+        for request in requests:
+            app.find_handler(request)
+
+    return (time.time() - t) / (iterations * len(requests))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    regex_app, dispatch_app = make_apps(count)
+
+    # Last router is the worst case for regex routing
+    prefix = 'router%d' % (count - 1)
+
+    for path in PATHS:
+        uri = path % prefix if '%s' in path else path
+        requests = [httputil.HTTPServerRequest(method='POST', uri=uri)]
+
+        regex = run(regex_app, requests, iterations)
+        dispatch = run(dispatch_app, requests, iterations)
+
+        print('%-34s regex %7.2f us, dispatcher %7.2f us' % (
+              uri, regex * 1000000, dispatch * 1000000))
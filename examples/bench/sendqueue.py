@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+    Session send queue benchmark. Compares string concatenation queue with
+    the chunk list queue used by `sockjs.tornado.session.Session` when lots
+    of messages are queued for disconnected polling session.
+
+    Usage: python sendqueue.py [messages] [sessions]
+"""
+import sys
+import time
+
+from sockjs.tornado.proto import json_encode
+
+
+class StringQueue(object):
+    """Old send queue implementation"""
+    def __init__(self):
+        self.send_queue = ''
+
+    def push(self, msg):
+        if self.send_queue:
+            self.send_queue += ','
+        self.send_queue += msg
+
+    def flush(self):
+        data = 'a[%s]' % self.send_queue
+        self.send_queue = ''
+        return data
+
+
+class ChunkQueue(object):
+    """Chunk list send queue implementation"""
+    def __init__(self):
+        self.send_queue = []
+        self.send_queue_size = 0
+
+    def push(self, msg):
+        self.send_queue.append(msg)
+        self.send_queue_size += len(msg)
+
+    def flush(self):
+        data = 'a[%s]' % ','.join(self.send_queue)
+        self.send_queue = []
+        self.send_queue_size = 0
+        return data
+
+
+def run(kls, messages, sessions, msg):
+    queues = [kls() for n in range(sessions)]
+
+    t = time.time()
+
+    for n in range(messages):
+        for q in queues:
+            q.push(msg)
+
+    for q in queues:
+        q.flush()
+
+    return time.time() - t
+
+
+if __name__ == '__main__':
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    msg = json_encode({'symbol': 'ABCD', 'bid': 101.25, 'ask': 101.5, 'seq': 12345})
+
+    for name, kls in (('string', StringQueue), ('chunks', ChunkQueue)):
+        elapsed = run(kls, messages, sessions, msg)
+        print('%-7s %d messages x %d sessions: %8.2f ms' % (
+              name, messages, sessions, elapsed * 1000))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+    Session container microbenchmark. Compares heapq based container with
+    the timing wheel container when every polling session is promoted
+    between expiration sweeps.
+
+    Usage: python sessioncontainer.py [sessions...]
+"""
+import sys
+import time
+
+from sockjs.tornado.sessioncontainer import (SessionMixin, SessionContainer,
+                                             TimingWheelSessionContainer)
+
+
+EXPIRY = 5
+SWEEPS = 10
+
+
+class PollingSession(SessionMixin):
+    """Session which is always promoted, like active xhr/jsonp session"""
+    def on_delete(self, forced):
+        pass
+
+
+def run(kls, count):
+    container = kls()
+    start = 1000000.0
+
+    for n in range(count):
+        s = PollingSession(str(n), EXPIRY)
+        # Spread expiration dates across the expiry window
+        s.expiry_date = start + EXPIRY * n / float(count)
+        container.add(s)
+
+    sessions = list(container._items.values())
+
+    total = 0
+    worst = 0
+
+    for sweep in range(1, SWEEPS + 1):
+        now = start + sweep
+
+        # Every session polls once a second
+        for s in sessions:
+            s.promoted = now + EXPIRY
+
+        t = time.time()
+        container.expire(now)
+        elapsed = time.time() - t
+
+        total += elapsed
+        worst = max(worst, elapsed)
+
+    return total / SWEEPS, worst
+
+
+if __name__ == '__main__':
+    counts = [int(c) for c in sys.argv[1:]] or [10000, 100000, 1000000]
+
+    for count in counts:
+        for name, kls in (('heap', SessionContainer),
+                          ('wheel', TimingWheelSessionContainer)):
+            avg, worst = run(kls, count)
+            print('%-6s %8d sessions: avg sweep %8.2f ms, worst %8.2f ms' % (
+                  name, count, avg * 1000, worst * 1000))
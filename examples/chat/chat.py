@@ -16,25 +16,23 @@ class IndexHandler(tornado.web.RequestHandler):
 
 class ChatConnection(sockjs.tornado.SockJSConnection):
     """Chat connection implementation"""
-    # Class level variable
-    participants = set()
-
     def on_open(self, info):
         # Send that someone joined
-        self.broadcast(self.participants, "Someone joined.")
+        self.publish('chat', "Someone joined.")
 
-        # Add client to the clients list
-        self.participants.add(self)
+        # Subscribe to the chat messages. Subscription is removed
+        # automatically when client disconnects.
+        self.subscribe('chat')
 
     def on_message(self, message):
         # Broadcast message
-        self.broadcast(self.participants, message)
+        self.publish('chat', message)
 
     def on_close(self):
-        # Remove client from the clients list and broadcast leave message
-        self.participants.remove(self)
+        # Broadcast leave message
+        self.unsubscribe('chat')
 
-        self.broadcast(self.participants, "Someone left.")
+        self.publish('chat', "Someone left.")
 
 if __name__ == "__main__":
     import logging
@@ -43,6 +43,6 @@ setup(
     ],
     requires=['tornado'],
     install_requires=[
-        'tornado >= 4.0.0'
+        'tornado >= 4.0.0, < 7'
     ]
 )
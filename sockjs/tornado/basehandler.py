@@ -6,6 +6,7 @@
     Various base http handlers
 """
 
+import time
 import datetime
 import socket
 import logging
@@ -14,9 +15,33 @@ from sockjs.tornado.util import asynchronous
 
 
 CACHE_TIME = 31536000
+CACHE_CONTROL = 'max-age=%d, public' % CACHE_TIME
 
 LOG = logging.getLogger("tornado.general")
 
+
+class ExpiresHeader(object):
+    """Expires header value for `enable_cache`, formatted at most once per
+    second"""
+    def __init__(self):
+        self.second = None
+        self.value = None
+
+    def get(self):
+        """Return header value for the current second"""
+        now = int(time.time())
+
+        if self.second != now:
+            d = datetime.datetime.fromtimestamp(now) + datetime.timedelta(seconds=CACHE_TIME)
+            self.second = now
+            self.value = d.strftime('%a, %d %b %Y %H:%M:%S')
+
+        return self.value
+
+
+_expires = ExpiresHeader()
+
+
 class BaseHandler(RequestHandler):
     """Base request handler with set of helpers."""
     def initialize(self, server):
@@ -53,10 +78,8 @@ class BaseHandler(RequestHandler):
     # Various helpers
     def enable_cache(self):
         """Enable client-side caching for the current request"""
-        self.set_header('Cache-Control', 'max-age=%d, public' % CACHE_TIME)
-
-        d = datetime.datetime.now() + datetime.timedelta(seconds=CACHE_TIME)
-        self.set_header('Expires', d.strftime('%a, %d %b %Y %H:%M:%S'))
+        self.set_header('Cache-Control', CACHE_CONTROL)
+        self.set_header('Expires', _expires.get())
 
         self.set_header('access-control-max-age', CACHE_TIME)
 
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+    sockjs.tornado.bus
+    ~~~~~~~~~~~~~~~~~~
+
+    Optional broadcast bus, which delivers published topic messages to the
+    sibling worker processes over Unix domain sockets.
+"""
+import os
+import socket
+import struct
+import logging
+
+from tornado import gen, ioloop, iostream, netutil, tcpserver
+
+from sockjs.tornado.util import bytes_to_str, str_to_bytes
+
+LOG = logging.getLogger("tornado.general")
+
+# Frame header: payload length and topic length
+HEADER = struct.Struct('!IH')
+
+# Max UTF-8 encoded topic length, limited by the frame header
+MAX_TOPIC_SIZE = 0xFFFF
+
+
+def check_topic(topic):
+    """Return UTF-8 encoded topic name. Raises ValueError if it does not fit
+    into the frame header.
+
+    `topic`
+        Topic name
+    """
+    topic = str_to_bytes(topic)
+
+    if len(topic) > MAX_TOPIC_SIZE:
+        raise ValueError('Topic name is longer than %d bytes' % MAX_TOPIC_SIZE)
+
+    return topic
+
+
+def encode_frame(topic, json_msg):
+    """Serialize bus frame
+
+    `topic`
+        Topic name
+    `json_msg`
+        JSON-encoded message
+    """
+    topic = check_topic(topic)
+    data = str_to_bytes(json_msg)
+
+    return HEADER.pack(len(topic) + len(data), len(topic)) + topic + data
+
+
+class _BusServer(tcpserver.TCPServer):
+    """Accepts connections from the sibling workers"""
+    def __init__(self, bus):
+        super(_BusServer, self).__init__()
+        self.bus = bus
+
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        try:
+            while True:
+                header = yield stream.read_bytes(HEADER.size)
+                size, topic_size = HEADER.unpack(header)
+
+                data = yield stream.read_bytes(size)
+
+                self.bus.on_message(bytes_to_str(data[:topic_size]),
+                                    data[topic_size:])
+        except iostream.StreamClosedError:
+            pass
+
+
+class BroadcastBus(object):
+    """Multi-process broadcast bus.
+
+    Each worker listens on its own Unix socket in the bus directory and
+    connects to the sockets of all other workers. Messages published with
+    `SockJSRouter.publish` are serialized once and the same buffer is written
+    to every sibling, which delivers them to its local topic subscribers.
+
+    Messages published while sibling is not connected are not delivered to
+    it.
+    """
+    def __init__(self, router, path, worker_id, workers, reconnect_interval=1000):
+        """Constructor.
+
+        `router`
+            `SockJSRouter` instance
+        `path`
+            Directory for the bus sockets, shared by all workers
+        `worker_id`
+            Id of the current worker, from 0 to `workers` - 1. For example,
+            `tornado.process.task_id()`
+        `workers`
+            Total number of workers
+        `reconnect_interval`
+            Interval between attempts to connect to missing workers (in
+            milliseconds)
+        """
+        self.router = router
+        self.path = path
+        self.worker_id = worker_id
+        self.workers = workers
+
+        self._peers = dict()
+        self._connecting = set()
+        self._server = None
+
+        self._reconnect = ioloop.PeriodicCallback(self._connect_peers,
+                                                  reconnect_interval)
+
+        router.bus = self
+
+    def get_socket_path(self, worker_id):
+        """Return Unix socket path of the worker"""
+        return os.path.join(self.path, 'worker-%d.sock' % worker_id)
+
+    def start(self):
+        """Start listening and connect to other workers"""
+        sock = netutil.bind_unix_socket(self.get_socket_path(self.worker_id))
+
+        self._server = _BusServer(self)
+        self._server.add_socket(sock)
+
+        self._connect_peers()
+        self._reconnect.start()
+
+    def stop(self):
+        """Stop bus"""
+        self._reconnect.stop()
+
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+        for stream in self._peers.values():
+            stream.close()
+
+        self._peers = dict()
+
+    def _connect_peers(self):
+        for worker_id in range(self.workers):
+            if (worker_id != self.worker_id and worker_id not in self._peers
+                    and worker_id not in self._connecting):
+                self._connect(worker_id)
+
+    @gen.coroutine
+    def _connect(self, worker_id):
+        self._connecting.add(worker_id)
+
+        stream = iostream.IOStream(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+
+        try:
+            yield stream.connect(self.get_socket_path(worker_id))
+        except (iostream.StreamClosedError, socket.error):
+            # Worker is not running yet, will retry later
+            stream.close()
+            return
+        finally:
+            self._connecting.discard(worker_id)
+
+        stream.set_close_callback(lambda: self._on_peer_closed(worker_id, stream))
+        self._peers[worker_id] = stream
+
+    def _on_peer_closed(self, worker_id, stream):
+        if self._peers.get(worker_id) is stream:
+            del self._peers[worker_id]
+
+    def send(self, topic, json_msg):
+        """Send JSON-encoded message to other workers. Raises ValueError if
+        UTF-8 encoded topic name is longer than `MAX_TOPIC_SIZE` bytes, even
+        if there are no other workers yet.
+
+        `topic`
+            Topic name
+        `json_msg`
+            JSON-encoded message
+        """
+        topic = check_topic(topic)
+
+        if not self._peers:
+            return
+
+        frame = encode_frame(topic, json_msg)
+
+        for worker_id, stream in list(self._peers.items()):
+            try:
+                stream.write(frame)
+            except iostream.StreamClosedError:
+                self._on_peer_closed(worker_id, stream)
+
+    def on_message(self, topic, json_msg):
+        """Called when message from other worker was received
+
+        `topic`
+            Topic name
+        `json_msg`
+            JSON-encoded message
+        """
+        try:
+            self.router.publish_jsonified(topic, json_msg)
+        except Exception:
+            LOG.exception('Failed to deliver bus message')
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    sockjs.tornado.channels
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Topic subscription registry used by the `SockJSRouter` publish/subscribe
+    helpers.
+"""
+
+
+class ChannelRegistry(object):
+    """Topic membership index.
+
+    Keeps two mappings: topic to subscribed connections and connection to its
+    topics, so both publishing and cleanup on close don't need to scan all
+    topics. Empty entries are removed right away.
+    """
+    def __init__(self):
+        self._topics = dict()
+        self._subscriptions = dict()
+
+    def subscribe(self, conn, topic):
+        """Subscribe connection to the topic. Returns False if connection
+        was already subscribed.
+
+        `conn`
+            `SockJSConnection` instance
+        `topic`
+            Topic name
+        """
+        members = self._topics.get(topic)
+        if members is None:
+            members = self._topics[topic] = set()
+        elif conn in members:
+            return False
+
+        members.add(conn)
+
+        topics = self._subscriptions.get(conn)
+        if topics is None:
+            self._subscriptions[conn] = set((topic,))
+        else:
+            topics.add(topic)
+
+        return True
+
+    def unsubscribe(self, conn, topic):
+        """Unsubscribe connection from the topic. Returns False if connection
+        was not subscribed.
+
+        `conn`
+            `SockJSConnection` instance
+        `topic`
+            Topic name
+        """
+        members = self._topics.get(topic)
+        if members is None or conn not in members:
+            return False
+
+        members.discard(conn)
+        if not members:
+            del self._topics[topic]
+
+        topics = self._subscriptions[conn]
+        topics.discard(topic)
+        if not topics:
+            del self._subscriptions[conn]
+
+        return True
+
+    def unsubscribe_all(self, conn):
+        """Remove connection from all topics. Returns list of topics which no
+        longer have subscribers.
+
+        `conn`
+            `SockJSConnection` instance
+        """
+        topics = self._subscriptions.pop(conn, None)
+        if not topics:
+            return []
+
+        removed = []
+        for topic in topics:
+            members = self._topics[topic]
+            members.discard(conn)
+            if not members:
+                del self._topics[topic]
+                removed.append(topic)
+
+        return removed
+
+    def get_subscribers(self, topic):
+        """Return set of connections subscribed to the topic. Returned set
+        should not be modified.
+
+        `topic`
+            Topic name
+        """
+        return self._topics.get(topic, ())
+
+    def get_topics(self, conn):
+        """Return set of topics connection is subscribed to
+
+        `conn`
+            `SockJSConnection` instance
+        """
+        return self._subscriptions.get(conn, ())
+
+    def __contains__(self, topic):
+        return topic in self._topics
+
+    def __len__(self):
+        return len(self._topics)
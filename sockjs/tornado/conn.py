@@ -8,6 +8,17 @@
 
 
 class SockJSConnection(object):
+    # Slow consumer policy name or `sockjs.tornado.policy.SlowConsumerPolicy`
+    # instance. If not set, router `slow_consumer_policy` setting is used.
+    slow_consumer_policy = None
+
+    # `concurrent.futures` executor. If set, incoming messages are passed to
+    # `process_message` in the executor instead of `on_message` and results
+    # are passed to `on_result` on the IOLoop, in the order of messages.
+    # Number of pending messages per session is limited by the
+    # `max_offload_pending` router setting.
+    executor = None
+
     def __init__(self, session):
         """Connection constructor.
 
@@ -32,18 +43,68 @@ class SockJSConnection(object):
         pass
 
     def on_message(self, message):
-        """Default on_message handler. Must be overridden in your application"""
+        """Default on_message handler. Must be overridden in your application.
+
+        Handler can be a coroutine or return awaitable. Messages of the
+        session are then handled one at a time, in order, and number of
+        sessions running handlers at once is limited by
+        `max_concurrent_handlers` setting.
+        """
+        raise NotImplementedError()
+
+    def process_message(self, message):
+        """Called in the `executor` for each incoming message. Should not
+        touch the session or the connection state, return value is passed to
+        `on_result`.
+
+        With `ProcessPoolExecutor` it must be a picklable static method::
+
+            class RenderConnection(SockJSConnection):
+                executor = ProcessPoolExecutor(4)
+
+                @staticmethod
+                def process_message(message):
+                    return render(message)
+
+        `message`
+            Incoming message
+        """
         raise NotImplementedError()
 
+    def on_result(self, result):
+        """Called on the IOLoop with the `process_message` result. Default
+        implementation sends it to the client, unless it is None.
+
+        `result`
+            Value returned by `process_message`
+        """
+        if result is not None:
+            self.send(result)
+
     def on_close(self):
         """Default on_close handler."""
         pass
 
+    def on_pause(self):
+        """Called when amount of pending outgoing data reached
+        `send_high_watermark`. Producers should stop sending until `on_drain`
+        is called."""
+        pass
+
+    def on_drain(self):
+        """Called when amount of pending outgoing data went down to the
+        `send_low_watermark` after `on_pause`."""
+        pass
+
     def send(self, message, binary=False):
         """Send message to the client.
 
         `message`
             Message to send.
+        `binary`
+            Send message as binary. Websocket clients which offered
+            'sockjs-binary' subprotocol receive it as binary frame, other
+            clients receive base64-encoded string.
         """
         if not self.is_closed:
             self.session.send_message(message, binary=binary)
@@ -61,6 +122,33 @@ class SockJSConnection(object):
         """
         self.session.broadcast(clients, message)
 
+    def subscribe(self, topic):
+        """Subscribe to the topic. Subscriptions are removed automatically
+        when connection is closed.
+
+        `topic`
+            Topic name
+        """
+        return self.session.server.subscribe(self, topic)
+
+    def unsubscribe(self, topic):
+        """Unsubscribe from the topic.
+
+        `topic`
+            Topic name
+        """
+        return self.session.server.unsubscribe(self, topic)
+
+    def publish(self, topic, message):
+        """Send message to all subscribers of the topic.
+
+        `topic`
+            Topic name
+        `message`
+            Message to send.
+        """
+        return self.session.server.publish(topic, message)
+
     def close(self):
         self.session.close()
 
@@ -68,3 +156,9 @@ class SockJSConnection(object):
     def is_closed(self):
         """Check if connection was closed"""
         return self.session.is_closed
+
+    @property
+    def is_writable(self):
+        """Check if connection is open and outgoing data does not exceed
+        high watermark"""
+        return not self.session.is_closed and not self.session.paused
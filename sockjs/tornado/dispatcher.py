@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+    sockjs.tornado.dispatcher
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Optional Tornado router for SockJS URLs. Requires Tornado 4.5 or higher.
+"""
+import re
+
+from tornado import escape, routing, web
+
+from sockjs.tornado import static, transports
+
+# Handlers of the URLs without session, by the last path segment
+STATIC_HANDLERS = {
+    'chunking_test': static.ChunkingTestHandler,
+    'info': static.InfoHandler,
+    'websocket': transports.RawWebSocketTransport,
+    '': static.GreetingsHandler
+}
+
+IFRAME_RE = re.compile(r'iframe[0-9-.a-z_]*.html$')
+
+
+class SockJSDispatcher(routing.Router):
+    """Tornado router for one or more `SockJSRouter` instances.
+
+    `SockJSRouter.urls` adds one regular expression for every transport
+    and static handler, which Tornado tries one after another. Dispatcher
+    splits request path once into prefix, server id, session id and
+    transport name and finds the handler with dictionary lookups.
+
+    Use `create_application` to build the application with dispatcher
+    rule listed before the application handlers::
+
+        app = SockJSDispatcher.create_application([EchoRouter, ChatRouter],
+                                                  [(r'/', IndexHandler)])
+
+    Requests which do not belong to any of the routers fall through to the
+    application handlers.
+
+    Dispatcher can also be added to the existing application with
+    `app.default_router.add_rules`. Tornado tries these rules only after
+    the application handlers, so none of them should match SockJS URLs.
+    """
+    def __init__(self, application, routers=None):
+        """Constructor.
+
+        `application`
+            Tornado application. Might be set later, before the first
+            request.
+        `routers`
+            Optional list of `SockJSRouter` instances
+        """
+        self.application = application
+
+        # prefix -> (router, handler kwargs)
+        self._routers = dict()
+
+        if routers:
+            for router in routers:
+                self.add_router(router)
+
+    @classmethod
+    def create_application(cls, routers, handlers=None, **settings):
+        """Create Tornado application, which passes requests to the
+        dispatcher first and to `handlers` if none of the routers matched.
+
+        `routers`
+            List of `SockJSRouter` instances
+        `handlers`
+            Optional list of application handlers
+        `settings`
+            Application settings
+        """
+        dispatcher = cls(None, routers)
+
+        rules = [(routing.AnyMatches(), dispatcher)]
+        if handlers:
+            rules.extend(handlers)
+
+        dispatcher.application = web.Application(rules, **settings)
+        return dispatcher.application
+
+    def add_router(self, router):
+        """Dispatch requests for the router prefix to the router handlers
+
+        `router`
+            `SockJSRouter` instance
+        """
+        self._routers[router.prefix] = (router, dict(server=router))
+
+    def find_handler(self, request, **kwargs):
+        path = request.path
+
+        # Session URL: prefix/server_id/session_id/transport
+        parts = path.rsplit('/', 3)
+        if len(parts) == 4:
+            entry = self._routers.get(parts[0])
+            if entry is not None:
+                router, handler_kwargs = entry
+
+                handler = router.transport_handlers.get(parts[3])
+                if (handler is not None
+                        and parts[1] and '.' not in parts[1]
+                        and parts[2] and '.' not in parts[2]):
+                    session_id = escape.url_unescape(parts[2], encoding=None, plus=False)
+
+                    return self.application.get_handler_delegate(
+                        request, handler, handler_kwargs,
+                        path_kwargs=dict(session_id=session_id))
+
+        # Greeting without trailing slash
+        entry = self._routers.get(path)
+        if entry is not None:
+            return self.application.get_handler_delegate(
+                request, static.GreetingsHandler, entry[1])
+
+        # Static URL: prefix/name
+        prefix, _, name = path.rpartition('/')
+
+        entry = self._routers.get(prefix)
+        if entry is None:
+            return None
+
+        handler = STATIC_HANDLERS.get(name)
+        if handler is None:
+            if IFRAME_RE.match(name) is None:
+                return None
+
+            handler = static.IFrameHandler
+
+        return self.application.get_handler_delegate(request, handler, entry[1])
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+    sockjs.tornado.limits
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Session admission control and inbound rate limiting helpers.
+"""
+import math
+import time
+import random
+from collections import deque
+
+from tornado.concurrent import Future
+
+# Close frame sent to the clients which were not admitted
+CLOSE_OVERLOADED = (1013, 'Try again later')
+
+# Close frames for sessions which went above inbound limits
+CLOSE_TOO_BIG = (1009, 'Message too big')
+CLOSE_POLICY = (1008, 'Message limit exceeded')
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter"""
+    def __init__(self, rate, burst=None):
+        """Constructor.
+
+        `rate`
+            Number of tokens added per second
+        `burst`
+            Bucket size. Defaults to `rate`
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+
+        self.tokens = self.burst
+        self.last = time.time()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def has_tokens(self, num=1):
+        """Check if `num` tokens are available without taking them"""
+        self._refill()
+        return self.tokens >= num
+
+    def consume(self, num=1):
+        """Take `num` tokens. Returns False if there is not enough tokens"""
+        self._refill()
+
+        if self.tokens < num:
+            return False
+
+        self.tokens -= num
+        return True
+
+
+class AdmissionControl(object):
+    """Decides if new sessions can be accepted by the router.
+
+    Sessions are rejected when number of active sessions, number of
+    sessions from one IP address or rate of new sessions goes above the
+    limits from router settings.
+    """
+    def __init__(self, settings, stats):
+        """Constructor.
+
+        `settings`
+            Router settings
+        `stats`
+            `sockjs.tornado.stats.StatsCollector` instance
+        """
+        self.stats = stats
+
+        self.max_sessions = settings['max_sessions']
+        self.max_sessions_per_ip = settings['max_sessions_per_ip']
+        # Retry-After is a whole number of seconds
+        self.retry_after = int(math.ceil(settings['admission_retry_after']))
+
+        self._bucket = None
+        if settings['session_rate'] is not None:
+            self._bucket = TokenBucket(settings['session_rate'], settings['session_burst'])
+
+        # Active sessions, total and by IP address
+        self.sessions = 0
+        self._ips = dict()
+
+    def check(self, ip, consume=True):
+        """Check if new session from `ip` can be accepted. Returns None if it
+        can or rejection reason otherwise.
+
+        `ip`
+            Client IP address
+        `consume`
+            Take token from the new session rate bucket. /info requests only
+            check if it is not empty.
+        """
+        reason = None
+
+        if self.max_sessions is not None and self.sessions >= self.max_sessions:
+            reason = 'max_sessions'
+        elif (self.max_sessions_per_ip is not None
+                and self._ips.get(ip, 0) >= self.max_sessions_per_ip):
+            reason = 'ip'
+        elif self._bucket is not None:
+            if not (self._bucket.consume() if consume else self._bucket.has_tokens()):
+                reason = 'rate'
+
+        if reason is not None:
+            self.stats.on_sess_rejected(reason)
+
+        return reason
+
+    def reject(self, handler):
+        """Finish request with 503 response. Retry-After is randomized, so
+        rejected clients do not come back at the same time.
+
+        `handler`
+            Tornado request handler
+        """
+        handler.set_status(503)
+        handler.set_header('Retry-After', str(random.randint(self.retry_after,
+                                                             self.retry_after * 2)))
+        handler.finish()
+
+    def on_opened(self, ip):
+        """Session from `ip` was opened"""
+        self.sessions += 1
+
+        if self.max_sessions_per_ip is not None:
+            self._ips[ip] = self._ips.get(ip, 0) + 1
+
+    def on_closed(self, ip):
+        """Session from `ip` was closed"""
+        self.sessions -= 1
+
+        count = self._ips.get(ip)
+        if count is not None:
+            if count > 1:
+                self._ips[ip] = count - 1
+            else:
+                del self._ips[ip]
+
+
+class ConcurrencyLimit(object):
+    """Limits number of asynchronous message handlers running at once"""
+    def __init__(self, limit):
+        """Constructor.
+
+        `limit`
+            Max number of running handlers or None for no limit
+        """
+        self.limit = limit
+        self.active = 0
+
+        self._waiters = deque()
+
+    @property
+    def full(self):
+        """Check if all slots are taken"""
+        return self.limit is not None and self.active >= self.limit
+
+    def acquire(self):
+        """Take a slot. Returns Future, which is resolved once slot is
+        available"""
+        f = Future()
+
+        if self.full:
+            self._waiters.append(f)
+        else:
+            self.active += 1
+            f.set_result(None)
+
+        return f
+
+    def release(self):
+        """Return slot, which is passed to the first waiter if any"""
+        while self._waiters:
+            f = self._waiters.popleft()
+            if not f.done():
+                f.set_result(None)
+                return
+
+        self.active -= 1
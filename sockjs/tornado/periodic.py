@@ -4,12 +4,15 @@
     ~~~~~~~~~~~~~~~~~~~~~~~
 
     This module implements customized PeriodicCallback from tornado with
-    support of the sliding window.
+    support of the sliding window, shared heartbeat scheduler and IOLoop
+    load monitor.
 """
 
 import time
 import logging
 
+from tornado import ioloop
+
 LOG = logging.getLogger("tornado.general")
 
 class Callback(object):
@@ -74,3 +77,176 @@ class Callback(object):
 
         if self._running:
             self.start(next_call)
+
+
+class HeartbeatScheduler(object):
+    """Shared scheduler for the periodic per-session callbacks.
+
+    Instead of having one `Callback` (and one IOLoop timeout) for each
+    session, items are grouped into buckets by their next run time and all
+    due buckets are processed from one periodic timer. Supports the same
+    sliding window semantics as `Callback.delay`.
+    """
+    def __init__(self, callback, callback_time, resolution=1000, delayed_callback=None):
+        """Constructor.
+
+        `callback`
+            Callback function, will be called with the item as an argument
+        `callback_time`
+            Callback timeout value (in milliseconds)
+        `resolution`
+            Bucket size and timer interval (in milliseconds)
+        `delayed_callback`
+            Optional function, called with number of callbacks which were
+            skipped because of `delay` during one timer run
+        """
+        self.callback = callback
+        self.delayed_callback = delayed_callback
+        self.callback_time = callback_time / 1000.0
+        self.resolution = resolution / 1000.0
+
+        self._buckets = dict()
+        self._slots = dict()
+        self._next_run = dict()
+        self._cursor = None
+
+        self._timer = ioloop.PeriodicCallback(self._run, resolution)
+        self._timer.start()
+
+    def _schedule(self, item, run_at):
+        slot = int(run_at / self.resolution)
+
+        if self._cursor is not None and slot < self._cursor:
+            slot = self._cursor
+
+        self._slots[item] = slot
+
+        bucket = self._buckets.get(slot)
+        if bucket is None:
+            self._buckets[slot] = set((item,))
+        else:
+            bucket.add(item)
+
+    def start(self, item):
+        """Start (or restart) callbacks for the item"""
+        self.stop(item)
+        self._schedule(item, time.time() + self.callback_time)
+
+    def stop(self, item):
+        """Stop callbacks for the item"""
+        slot = self._slots.pop(item, None)
+
+        if slot is not None:
+            self._next_run.pop(item, None)
+
+            bucket = self._buckets.get(slot)
+            if bucket is not None:
+                bucket.discard(item)
+                if not bucket:
+                    del self._buckets[slot]
+
+    def delay(self, item):
+        """Delay callback for the item"""
+        if item in self._slots:
+            self._next_run[item] = time.time() + self.callback_time
+
+    def _run(self):
+        if not self._buckets:
+            self._cursor = None
+            return
+
+        now = time.time()
+        now_slot = int(now / self.resolution)
+
+        if self._cursor is None:
+            self._cursor = min(self._buckets)
+
+        slots = self._slots
+        next_runs = self._next_run
+        delayed = 0
+
+        while self._cursor <= now_slot:
+            slot = self._cursor
+            self._cursor += 1
+
+            bucket = self._buckets.pop(slot, None)
+            if bucket is None:
+                continue
+
+            for item in bucket:
+                # Item was stopped or restarted from another callback
+                if slots.get(item) != slot:
+                    continue
+
+                # Support for shifting callback window
+                next_run = next_runs.pop(item, None)
+                if next_run is not None and now < next_run:
+                    self._schedule(item, next_run)
+                    delayed += 1
+                    continue
+
+                try:
+                    self.callback(item)
+                except (KeyboardInterrupt, SystemExit):
+                    raise
+                except:
+                    LOG.error("Error in heartbeat callback", exc_info=True)
+
+                if slots.get(item) == slot:
+                    self._schedule(item, now + self.callback_time)
+
+        if delayed and self.delayed_callback is not None:
+            self.delayed_callback(delayed)
+
+
+class LoadMonitor(object):
+    """Measures IOLoop lag: how late a timer runs compared to its deadline.
+    Idle IOLoop runs timers on time, busy one runs them after all ready
+    callbacks and socket events were processed.
+    """
+    def __init__(self, callback, callback_time, io_loop=None):
+        """Constructor.
+
+        `callback`
+            Callback function, will be called with the measured lag (in
+            seconds) as an argument
+        `callback_time`
+            Measurement interval (in milliseconds)
+        `io_loop`
+            Optional IOLoop instance
+        """
+        self.callback = callback
+        self.callback_time = callback_time / 1000.0
+        self.io_loop = io_loop or ioloop.IOLoop.current()
+        self.lag = 0
+
+        self._running = False
+        self._deadline = None
+
+    def start(self):
+        """Start measurements"""
+        self._running = True
+        self._schedule()
+
+    def stop(self):
+        """Stop measurements"""
+        self._running = False
+
+    def _schedule(self):
+        self._deadline = self.io_loop.time() + self.callback_time
+        self.io_loop.add_timeout(self._deadline, self._run)
+
+    def _run(self):
+        if not self._running:
+            return
+
+        self.lag = max(self.io_loop.time() - self._deadline, 0)
+
+        try:
+            self.callback(self.lag)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            LOG.error("Error in load monitor callback", exc_info=True)
+
+        self._schedule()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+    sockjs.tornado.policy
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Slow consumer policies. Policy is consulted by the session when its
+    outgoing data reaches `send_queue_limit`.
+"""
+
+
+class SlowConsumerPolicy(object):
+    """Base slow consumer policy"""
+    name = 'override_me_please'
+
+    def on_overflow(self, session, msg):
+        """Called when new message does not fit into the session send queue.
+        Return True if message should be queued, False if it was dropped.
+
+        `session`
+            `Session` instance
+        `msg`
+            JSON-encoded message (bytes)
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def fits(session, size):
+        """Check if `size` more bytes fit into the session limit"""
+        return (session.send_queue_size + session.send_buffer_size + size
+                <= session.send_queue_limit)
+
+
+class DropNewestPolicy(SlowConsumerPolicy):
+    """Reject new messages until there's enough room in the queue"""
+    name = 'drop_newest'
+
+    def on_overflow(self, session, msg):
+        session.stats.on_msg_dropped(self.name, 1)
+        return False
+
+
+class DropOldestPolicy(SlowConsumerPolicy):
+    """Drop oldest queued messages to make room for the new one"""
+    name = 'drop_oldest'
+
+    def on_overflow(self, session, msg):
+        size = len(msg)
+
+        dropped = 0
+        while session.send_queue and not self.fits(session, size):
+            session.drop_oldest()
+            dropped += 1
+
+        queued = self.fits(session, size)
+        if not queued:
+            # Transport buffer alone is above the limit
+            dropped += 1
+
+        if dropped:
+            session.stats.on_msg_dropped(self.name, dropped)
+
+        return queued
+
+
+class CoalescePolicy(DropOldestPolicy):
+    """Keep only latest queued message for each key. If queue still does not
+    fit after that, falls back to dropping oldest messages.
+    """
+    name = 'coalesce'
+
+    def __init__(self, key):
+        """Constructor.
+
+        `key`
+            Function which returns key for the JSON-encoded message (bytes)
+        """
+        self.key = key
+
+    def on_overflow(self, session, msg):
+        queue = session.send_queue
+        key = self.key
+
+        new_key = key(msg)
+        latest = dict()
+        for m in queue:
+            k = key(m)
+            if k != new_key:
+                latest[k] = m
+
+        # Preserve order of the latest messages
+        kept = [m for m in queue if latest.get(key(m)) is m]
+        dropped = len(queue) - len(kept)
+
+        session.replace_queue(kept)
+
+        if dropped:
+            session.stats.on_msg_dropped(self.name, dropped)
+
+        return super(CoalescePolicy, self).on_overflow(session, msg)
+
+
+class DisconnectPolicy(SlowConsumerPolicy):
+    """Close slow session"""
+    name = 'disconnect'
+
+    def __init__(self, code=3001, reason='Slow consumer'):
+        """Constructor.
+
+        `code`
+            Close code
+        `reason`
+            Close reason
+        """
+        self.code = code
+        self.reason = reason
+
+    def on_overflow(self, session, msg):
+        # Session is already scheduled to close
+        if session.is_closed:
+            session.stats.on_msg_dropped(self.name, 1)
+            return False
+
+        session.stats.on_msg_dropped(self.name, len(session.send_queue) + 1)
+
+        session.discard_queue()
+
+        # Close on next tick: `on_close` usually removes the connection from
+        # the set which `broadcast` is iterating over
+        session.delayed_close(self.code, self.reason)
+        return False
+
+
+POLICIES = {
+    'drop_newest': DropNewestPolicy(),
+    'drop_oldest': DropOldestPolicy(),
+    'disconnect': DisconnectPolicy()
+}
+
+
+def get_policy(policy):
+    """Return policy instance by its name. Policy instances are returned as is.
+
+    `policy`
+        Policy name or `SlowConsumerPolicy` instance
+    """
+    if isinstance(policy, SlowConsumerPolicy):
+        return policy
+
+    return POLICIES[policy]
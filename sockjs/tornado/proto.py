@@ -5,37 +5,185 @@
 
     SockJS protocol related functions
 """
+import json
+import codecs
 import logging
 
+from sockjs.tornado.util import str_to_bytes
+
 LOG = logging.getLogger("tornado.general")
 
-# TODO: Add support for ujson module once they can accept unicode strings
+
+def _json_encode(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _to_text(data):
+    # Decodes bytes, bytearray and memoryview without intermediate copy
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return codecs.utf_8_decode(data)[0]
+    return data
+
+
+def _json_decode(data):
+    return json.loads(_to_text(data))
+
+
+class JSONCodec(object):
+    """JSON codec based on the standard `json` module.
+
+    Encoded output is always ASCII: SockJS requires some unicode characters
+    to be escaped and escaping all of them is the simplest way to follow it.
+    Decoder accepts str, bytes, bytearray and memoryview, so transports can
+    pass received buffer without copying it first.
+    """
+    name = 'json'
+
+    def encode(self, data):
+        """Encode data, returns str"""
+        return _json_encode(data)
+
+    def encode_bytes(self, data):
+        """Encode data, returns bytes"""
+        return self.encode(data).encode('ascii')
+
+    def decode(self, data):
+        """Decode str, bytes, bytearray or memoryview"""
+        return _json_decode(data)
+
+
+class SimpleJSONCodec(JSONCodec):
+    """simplejson codec"""
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self._dumps = simplejson.dumps
+        self._loads = simplejson.loads
+
+    def encode(self, data):
+        return self._dumps(data, separators=(',', ':'))
+
+    def decode(self, data):
+        return self._loads(_to_text(data))
+
+
+class UJSONCodec(JSONCodec):
+    """ujson codec"""
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._dumps = ujson.dumps
+        self._loads = ujson.loads
+
+    def encode(self, data):
+        return self._dumps(data, ensure_ascii=True, escape_forward_slashes=False)
+
+    def decode(self, data):
+        data = _to_text(data)
+        try:
+            return self._loads(data)
+        except ValueError:
+            # ujson rejects lone surrogates, which are valid in JSON
+            return _json_decode(data)
+
+
+class ORJSONCodec(JSONCodec):
+    """orjson codec. orjson always produces UTF-8 output, so non-ASCII
+    messages are encoded with the standard `json` module instead.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode_bytes(self, data):
+        try:
+            result = self._dumps(data)
+        except TypeError:
+            # Types orjson does not support, like big integers
+            return _json_encode(data).encode('ascii')
+
+        if not result.isascii():
+            return _json_encode(data).encode('ascii')
+
+        return result
+
+    def encode(self, data):
+        return self.encode_bytes(data).decode('ascii')
+
+    def decode(self, data):
+        try:
+            return self._loads(data)
+        except ValueError:
+            # orjson rejects lone surrogates, which are valid in JSON
+            return _json_decode(data)
+
+
+CODECS = dict()
+
+# Codecs in order of preference
+CODEC_CLASSES = [ORJSONCodec, UJSONCodec, SimpleJSONCodec, JSONCodec]
+
+
+def register_codec(codec):
+    """Register codec instance, so it can be selected with the `json_codec`
+    router setting.
+
+    `codec`
+        Codec instance
+    """
+    CODECS[codec.name] = codec
+
+
+def get_codec(name=None):
+    """Return codec by name. If name is None, returns default codec.
+
+    `name`
+        Codec name, for example 'orjson', 'ujson', 'simplejson' or 'json'
+    """
+    if name is None:
+        return default_codec
+
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError('JSON codec %s is not available' % name)
+
+
+for kls in reversed(CODEC_CLASSES):
+    try:
+        register_codec(kls())
+    except ImportError:
+        pass
 
 # Try to find best json encoder available
-try:
-    # Check for simplejson
-    import simplejson
+for kls in CODEC_CLASSES:
+    if kls.name in CODECS:
+        default_codec = CODECS[kls.name]
+        break
 
-    json_encode = lambda data: simplejson.dumps(data, separators=(',', ':'))
-    json_decode = lambda data: simplejson.loads(data)
-    JSONDecodeError = ValueError
+LOG.debug('sockjs.tornado will use %s module' % default_codec.name)
 
-    LOG.debug('sockjs.tornado will use simplejson module')
-except ImportError:
-    # Use slow json
-    import json
+json_encode = default_codec.encode
+json_decode = default_codec.decode
+JSONDecodeError = ValueError
 
-    LOG.debug('sockjs.tornado will use json module')
+# Protocol handlers. Frames are sent as bytes.
+CONNECT = b'o'
+DISCONNECT = b'c'
+MESSAGE = b'm'
+HEARTBEAT = b'h'
 
-    json_encode = lambda data: json.dumps(data, separators=(',', ':'))
-    json_decode = lambda data: json.loads(data)
-    JSONDecodeError = ValueError
+# Data frame template
+MESSAGES = b'a[%s]'
 
-# Protocol handlers
-CONNECT = 'o'
-DISCONNECT = 'c'
-MESSAGE = 'm'
-HEARTBEAT = 'h'
+# Websocket subprotocol, which client offers to receive binary messages as
+# binary websocket frames instead of base64-encoded strings
+BINARY_SUBPROTOCOL = 'sockjs-binary'
 
 
 # Various protocol helpers
@@ -47,4 +195,4 @@ def disconnect(code, reason):
     `reason`
         Closing reason
     """
-    return 'c[%d,"%s"]' % (code, reason)
+    return str_to_bytes('c[%d,"%s"]' % (code, reason))
@@ -6,14 +6,20 @@
     SockJS protocol router implementation.
 """
 
-from tornado import ioloop, version_info
+import time
 
-from sockjs.tornado import transports, session, sessioncontainer, static, stats, proto
+from tornado import ioloop, gen, version_info
+
+from sockjs.tornado import (transports, session, sessioncontainer, static, stats, proto,
+                            periodic, policy, websocket, channels, limits)
 
 
 DEFAULT_SETTINGS = {
     # Sessions check interval in seconds
     'session_check_interval': 1,
+    # Session container implementation: 'heap' or 'wheel'. Timing wheel
+    # container works better with lots of polling sessions.
+    'session_container': 'heap',
     # Session expiration in seconds
     'disconnect_delay': 5,
     # Heartbeat time in seconds. Do not change this value unless
@@ -25,16 +31,102 @@ DEFAULT_SETTINGS = {
     'sockjs_url': 'https://cdn.jsdelivr.net/sockjs/0.3/sockjs.min.js',
     # Max response body size
     'response_limit': 128 * 1024,
+    # gzip compression for xhr_streaming, eventsource and htmlfile responses,
+    # used when client sends Accept-Encoding: gzip. Each message is flushed
+    # with Z_SYNC_FLUSH and response_limit applies to compressed bytes.
+    'streaming_compression': False,
+    'streaming_compression_level': 6,
+    'streaming_compression_mem_level': 8,
+    # Outgoing flow control. When amount of pending outgoing data for a
+    # session reaches high watermark (in bytes), connection `on_pause` is
+    # called. Once it goes down to the low watermark, `on_drain` is called.
+    # Set high watermark to None to disable flow control.
+    'send_high_watermark': None,
+    'send_low_watermark': 0,
+    # Limit of pending outgoing data per session, in bytes. When message does
+    # not fit, slow consumer policy is applied: 'drop_oldest', 'drop_newest',
+    # 'disconnect' or `sockjs.tornado.policy.SlowConsumerPolicy` instance.
+    # Set limit to None to disable it.
+    'send_queue_limit': None,
+    'slow_consumer_policy': 'disconnect',
+    # Incremental broadcast budget: max number of recipients and max time (in
+    # milliseconds) processed before yielding back to the IOLoop. Time budget
+    # is ignored if set to None.
+    'broadcast_slice_size': 1000,
+    'broadcast_slice_time': None,
+    # JSON codec: 'orjson', 'ujson', 'simplejson', 'json' or None to use
+    # best available one
+    'json_codec': None,
+    # Allow websocket clients to receive binary messages as binary frames by
+    # offering 'sockjs-binary' subprotocol. Other clients receive binary
+    # messages as base64-encoded strings.
+    'binary_messages': True,
+    # Admission control. New sessions are rejected when there are
+    # max_sessions active sessions, max_sessions_per_ip sessions from the
+    # client IP address or when new session rate goes above session_rate
+    # per second (with bursts up to session_burst sessions). Rejected /info
+    # and websocket requests get 503 with Retry-After between
+    # admission_retry_after and twice that seconds, polling and streaming
+    # transports get a close frame. Set limits to None to disable them.
+    'max_sessions': None,
+    'max_sessions_per_ip': None,
+    'session_rate': None,
+    'session_burst': None,
+    'admission_retry_after': 5,
+    # Inbound limits per session: max_message_rate messages per second
+    # (with bursts up to max_message_burst messages), max_message_size bytes
+    # per websocket message or xhr_send/jsonp_send request body and
+    # max_batch_length messages in one batch. Sessions which go above the
+    # limits are closed with 1008 or 1009 close code. Oversized websocket
+    # messages are rejected by Tornado. Set limits to None to disable them.
+    'max_message_rate': None,
+    'max_message_burst': None,
+    'max_message_size': None,
+    'max_batch_length': None,
+    # Max number of sessions running asynchronous on_message handlers at
+    # once. While limit is reached, other sessions wait for a free slot,
+    # websocket reads are paused and xhr_send/jsonp_send answer 429 to
+    # sessions with asynchronous handlers. Set to None for no limit.
+    'max_concurrent_handlers': None,
+    # Max number of messages one session can have waiting for the connection
+    # executor. While limit is reached, websocket reads of the session are
+    # paused and xhr_send/jsonp_send answer 429. Set to None for no limit.
+    'max_offload_pending': 100,
     # Enable or disable JSESSIONID cookie handling
     'jsessionid': True,
+    # Linger window for xhr and jsonp polling. After first message, polling
+    # response waits up to polling_linger milliseconds or until at least
+    # polling_linger_size bytes are queued, so more messages are delivered
+    # with one request. Set polling_linger to 0 to respond right away and
+    # polling_linger_size to None to wait for the time window only.
+    'polling_linger': 0,
+    'polling_linger_size': 16 * 1024,
     # Should sockjs-tornado flush messages immediately or queue then and
-    # flush on next ioloop tick
+    # flush on next ioloop tick. With 'adaptive', messages are flushed
+    # immediately while the ioloop keeps up and batched into one frame per
+    # tick when ioloop lag reaches adaptive_flush_lag milliseconds.
     'immediate_flush': True,
+    'adaptive_flush_lag': 5,
     # Enable or disable Nagle for persistent transports
     'disable_nagle': True,
     # Enable IP checks for polling transports. If enabled, all subsequent
     # polling calls should be from the same IP address.
     'verify_ip': True,
+    # permessage-deflate compression for websocket connections: True, False
+    # or None to enable it only for Tornado 4.2+ 4.x releases
+    'websocket_compression': None,
+    # zlib compression level and memory level. Lower memory level reduces
+    # per-connection zlib memory at the cost of compression ratio. Requires
+    # Tornado 4.5 or higher, older releases use their defaults.
+    'websocket_compression_level': 6,
+    'websocket_compression_mem_level': 8,
+    # Messages shorter than this (in bytes) are sent uncompressed
+    'websocket_compression_min_size': 0,
+    # Reset compression context after each message. Server no-context-takeover
+    # frees compressor memory between messages, client no-context-takeover
+    # does the same for the decompressor. Tested with Tornado 4.5 to 6.5.
+    'websocket_server_no_context_takeover': False,
+    'websocket_client_no_context_takeover': False,
     # list of allowed origins for websocket connections
     # or "*" - accept all websocket connections
     'websocket_allow_origin': "*"
@@ -54,6 +146,17 @@ TRANSPORTS = {
     'htmlfile': transports.HtmlFileTransport
 }
 
+SESSION_CONTAINERS = {
+    'heap': sessioncontainer.SessionContainer,
+    'wheel': sessioncontainer.TimingWheelSessionContainer
+}
+
+# Number of recipients between time budget checks in `broadcast_async`
+BROADCAST_TIME_STEP = 100
+
+# IOLoop lag measurement interval for adaptive flush, in milliseconds
+LOAD_CHECK_INTERVAL = 100
+
 STATIC_HANDLERS = {
     '/chunking_test': static.ChunkingTestHandler,
     '/info': static.InfoHandler,
@@ -63,6 +166,47 @@ STATIC_HANDLERS = {
 }
 
 
+class BroadcastMessage(object):
+    """Message sent to many sessions. JSON form and websocket frame are built
+    on first use, so broadcasts to raw websocket sessions only do not encode
+    the message at all."""
+    def __init__(self, router, msg=None, json_msg=None):
+        """Constructor.
+
+        `router`
+            `SockJSRouter` instance
+        `msg`
+            Message to send
+        `json_msg`
+            JSON-encoded message, if it is already known
+        """
+        self.router = router
+        self._msg = msg
+        self._json_msg = json_msg
+        self._frame = None
+
+    @property
+    def msg(self):
+        """Message to send. Decoded from JSON if only JSON form is known"""
+        if self._msg is None and self._json_msg is not None:
+            self._msg = self.router.codec.decode(self._json_msg)
+        return self._msg
+
+    @property
+    def json_msg(self):
+        """JSON-encoded message"""
+        if self._json_msg is None:
+            self._json_msg = self.router.codec.encode_bytes(self._msg)
+        return self._json_msg
+
+    @property
+    def frame(self):
+        """Prepared websocket message or None if websockets are disabled"""
+        if self._frame is None and self.router.websockets_enabled:
+            self._frame = websocket.PreparedMessage(proto.MESSAGES % self.json_msg)
+        return self._frame
+
+
 class SockJSRouter(object):
     """SockJS protocol router"""
     def __init__(self,
@@ -98,12 +242,25 @@ class SockJSRouter(object):
         if user_settings:
             self.settings.update(user_settings)
 
+        if ((self.settings['websocket_server_no_context_takeover']
+                or self.settings['websocket_client_no_context_takeover'])
+                and not websocket.NO_CONTEXT_TAKEOVER_SUPPORTED):
+            raise Exception('websocket no-context-takeover is not supported '
+                            'by this Tornado version.')
+
+        self.codec = proto.get_codec(self.settings['json_codec'])
+
+        self.slow_consumer_policy = policy.get_policy(self.settings['slow_consumer_policy'])
+
         self.websockets_enabled = 'websocket' not in self.settings['disabled_transports']
         self.cookie_needed = self.settings['jsessionid']
 
+        # Pre-rendered /info, iframe and greeting responses
+        self.static_responses = static.StaticResponses(self)
+
         # Sessions
         self._session_kls = session_kls if session_kls else session.Session
-        self._sessions = sessioncontainer.SessionContainer()
+        self._sessions = SESSION_CONTAINERS[self.settings['session_container']]()
 
         check_interval = self.settings['session_check_interval'] * 1000
         self._sessions_cleanup = ioloop.PeriodicCallback(self._sessions.expire,
@@ -113,9 +270,42 @@ class SockJSRouter(object):
         # Stats
         self.stats = stats.StatsCollector(self.io_loop)
 
+        # Session admission control
+        self.admission = limits.AdmissionControl(self.settings, self.stats)
+
+        # Running asynchronous message handlers
+        self.handler_slots = limits.ConcurrencyLimit(self.settings['max_concurrent_handlers'])
+
+        # Topic subscriptions
+        self.channels = channels.ChannelRegistry()
+
+        # Optional `sockjs.tornado.bus.BroadcastBus`, set by the bus itself
+        self.bus = None
+
+        # Heartbeats, shared by all sessions
+        self.heartbeats = periodic.HeartbeatScheduler(lambda s: s._heartbeat(),
+                                                      self.settings['heartbeat_delay'] * 1000,
+                                                      delayed_callback=self.stats.on_heartbeat_suppressed)
+
+        # Adaptive flush: sessions batch messages while ioloop is lagging
+        self.flush_batched = False
+        self.load_monitor = None
+
+        if self.settings['immediate_flush'] == 'adaptive':
+            self.stats.adaptive_flush = True
+            self.load_monitor = periodic.LoadMonitor(self._on_loop_lag,
+                                                     LOAD_CHECK_INTERVAL,
+                                                     self.io_loop)
+            self.load_monitor.start()
+
         # Initialize URLs
+        self.prefix = prefix
         base = prefix + r'/[^/.]+/(?P<session_id>[^/.]+)'
 
+        # Handlers of the session URLs by the last path segment, used by
+        # `sockjs.tornado.dispatcher.SockJSDispatcher`
+        self.transport_handlers = dict(GLOBAL_HANDLERS)
+
         # Generate global handler URLs
         self._transport_urls = [('%s/%s$' % (base, p[0]), p[1], dict(server=self))
                                 for p in GLOBAL_HANDLERS]
@@ -124,6 +314,8 @@ class SockJSRouter(object):
             if k in self.settings['disabled_transports']:
                 continue
 
+            self.transport_handlers[k] = v
+
             # Only version 1 is supported
             self._transport_urls.append(
                 (r'%s/%s$' % (base, k),
@@ -179,30 +371,199 @@ class SockJSRouter(object):
         """Return associated connection class"""
         return self._connection
 
+    def _on_loop_lag(self, lag):
+        """Switch adaptive flush mode based on the measured IOLoop lag"""
+        threshold = self.settings['adaptive_flush_lag'] / 1000.0
+
+        # Switch back only when lag drops well below the threshold, so
+        # mode does not flap around it
+        if self.flush_batched:
+            self.flush_batched = lag >= threshold / 2
+        else:
+            self.flush_batched = lag >= threshold
+
+        self.stats.on_loop_lag(lag, self.flush_batched)
+
     # Broadcast helper
     def broadcast(self, clients, msg):
         """Optimized `broadcast` implementation. Depending on type of the session, will json-encode
         message once and will call either `send_message` or `send_jsonifed`.
+        Websocket frame is also built once and same buffer is written to all
+        websocket connections without compression. Connections with
+        permessage-deflate and server no-context-takeover share one compressed
+        frame per compression parameter set.
 
         `clients`
             Clients iterable
         `msg`
             Message to send
         """
-        json_msg = None
+        count = self._send_broadcast(clients, BroadcastMessage(self, msg))
+
+        self.stats.on_pack_sent(count)
+
+        return count
+
+    @gen.coroutine
+    def broadcast_async(self, clients, msg, slice_size=None, slice_time=None):
+        """Incremental `broadcast` for large audiences. Sends message to the
+        clients in slices and yields back to the IOLoop between slices.
+        Returns Future which resolves with number of recipients once message
+        was sent to all clients.
+
+        `clients`
+            Clients iterable. Copied before first slice is sent.
+        `msg`
+            Message to send
+        `slice_size`
+            Max number of recipients per slice. Defaults to the
+            `broadcast_slice_size` setting.
+        `slice_time`
+            Max slice duration in milliseconds. Defaults to the
+            `broadcast_slice_time` setting.
+        """
+        start = time.time()
+
+        if slice_size is None:
+            slice_size = self.settings['broadcast_slice_size']
+        if slice_time is None:
+            slice_time = self.settings['broadcast_slice_time']
+
+        clients = tuple(clients)
+        total = len(clients)
+
+        # Check time budget every few recipients
+        step = slice_size
+        if slice_time is not None:
+            step = min(step, BROADCAST_TIME_STEP)
+            slice_time /= 1000.0
+
+        message = BroadcastMessage(self, msg)
 
+        count = 0
+        pos = 0
+
+        while True:
+            deadline = time.time() + slice_time if slice_time is not None else None
+            sent = 0
+
+            while pos < total and sent < slice_size:
+                end = min(pos + step, total)
+                count += self._send_broadcast(clients[pos:end], message)
+                sent += end - pos
+                pos = end
+
+                if deadline is not None and time.time() >= deadline:
+                    break
+
+            if pos >= total:
+                break
+
+            yield gen.moment
+
+        self.stats.on_pack_sent(count)
+        self.stats.on_broadcast_done(time.time() - start)
+
+        raise gen.Return(count)
+
+    def _send_broadcast(self, clients, message):
+        """Send `BroadcastMessage` to the clients, returns number of recipients"""
         count = 0
 
         for c in clients:
             sess = c.session
             if not sess.is_closed:
                 if sess.send_expects_json:
-                    if json_msg is None:
-                        json_msg = proto.json_encode(msg)
-                    sess.send_jsonified(json_msg, False)
+                    sess.send_jsonified(message.json_msg, False, message.frame)
                 else:
-                    sess.send_message(msg, stats=False)
+                    sess.send_message(message.msg, stats=False)
 
                 count += 1
 
+        return count
+
+    # Topics
+    def subscribe(self, conn, topic):
+        """Subscribe connection to the topic. Subscriptions are removed
+        automatically when session is closed.
+
+        `conn`
+            `SockJSConnection` instance
+        `topic`
+            Topic name
+        """
+        return self.channels.subscribe(conn, topic)
+
+    def unsubscribe(self, conn, topic):
+        """Unsubscribe connection from the topic
+
+        `conn`
+            `SockJSConnection` instance
+        `topic`
+            Topic name
+        """
+        if self.channels.unsubscribe(conn, topic):
+            if topic not in self.channels:
+                self.stats.on_topic_removed(topic)
+            return True
+
+        return False
+
+    def unsubscribe_all(self, conn):
+        """Unsubscribe connection from all topics
+
+        `conn`
+            `SockJSConnection` instance
+        """
+        for topic in self.channels.unsubscribe_all(conn):
+            self.stats.on_topic_removed(topic)
+
+    def publish(self, topic, msg):
+        """Send message to all topic subscribers using `broadcast`. If bus is
+        attached, message is also sent to other processes. Returns number of
+        local recipients.
+
+        With bus attached, raises ValueError before sending anything if
+        UTF-8 encoded topic name is longer than 65535 bytes.
+
+        `topic`
+            Topic name
+        `msg`
+            Message to send
+        """
+        if self.bus is None and topic not in self.channels:
+            return 0
+
+        message = BroadcastMessage(self, msg)
+
+        if self.bus is not None:
+            self.bus.send(topic, message.json_msg)
+
+        return self._publish_prepared(topic, message)
+
+    def publish_jsonified(self, topic, json_msg):
+        """Send JSON-encoded message to local topic subscribers. Used by the
+        bus to deliver messages published by other processes.
+
+        `topic`
+            Topic name
+        `json_msg`
+            JSON-encoded message
+        """
+        if topic not in self.channels:
+            return 0
+
+        return self._publish_prepared(topic, BroadcastMessage(self, json_msg=json_msg))
+
+    def _publish_prepared(self, topic, message):
+        members = self.channels.get_subscribers(topic)
+        if not members:
+            return 0
+
+        # Sessions might get closed (and unsubscribed) while sending
+        count = self._send_broadcast(tuple(members), message)
+
         self.stats.on_pack_sent(count)
+        self.stats.on_topic_published(topic, count)
+
+        return count
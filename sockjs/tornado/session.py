@@ -6,14 +6,31 @@
     SockJS session implementation.
 """
 
+import time
+import base64
 import logging
 
-from sockjs.tornado import sessioncontainer, periodic, proto
-from sockjs.tornado.util import bytes_to_str
+try:
+    from inspect import iscoroutinefunction
+except ImportError:
+    iscoroutinefunction = None
+from collections import deque
+
+from tornado import gen
+from tornado.concurrent import Future, is_future
+
+from sockjs.tornado import sessioncontainer, proto, policy, limits
+from sockjs.tornado.util import bytes_to_str, str_to_bytes
 
 LOG = logging.getLogger("tornado.general")
 
 
+class BinaryMessage(bytes):
+    """Binary message in the session send queue. Sent as a separate binary
+    websocket frame instead of being packed with JSON-encoded messages."""
+    __slots__ = ()
+
+
 class ConnectionInfo(object):
     """Connection information object.
 
@@ -56,6 +73,24 @@ class ConnectionInfo(object):
         return self.headers.get(name)
 
 
+def _is_awaitable(value):
+    """Check if `on_message` returned something to wait for"""
+    return is_future(value) or hasattr(value, '__await__')
+
+
+def _is_coroutine_function(func):
+    """Check if `func` is a native or Tornado coroutine"""
+    return gen.is_coroutine_function(func) or (iscoroutinefunction is not None
+                                                and iscoroutinefunction(func))
+
+
+def _timed_call(func, message):
+    """Run `process_message` in the executor and measure execution time"""
+    start = time.time()
+    result = func(message)
+    return result, time.time() - start
+
+
 # Session states
 CONNECTING = 0
 OPEN = 1
@@ -87,6 +122,35 @@ class BaseSession(object):
 
         self.close_reason = None
 
+        # Incoming messages waiting for the asynchronous `on_message`
+        self._inbound = deque()
+        self._inbound_running = False
+        self._inbound_drained = None
+        self.async_handler = _is_coroutine_function(self.conn.on_message)
+
+        # Messages submitted to the connection executor, in order
+        self._offloaded = deque()
+        self._max_offload_pending = server.settings['max_offload_pending']
+
+        # Outgoing flow control. Amount of bytes queued by the session and
+        # bytes passed to the transport, but not yet written to the socket.
+        self.send_queue_size = 0
+        self.send_buffer_size = 0
+        self.paused = False
+
+        self._high_watermark = server.settings['send_high_watermark']
+        self._low_watermark = server.settings['send_low_watermark']
+        self.send_queue_limit = server.settings['send_queue_limit']
+
+        # Inbound limits
+        self._max_message_size = server.settings['max_message_size']
+        self._max_batch_length = server.settings['max_batch_length']
+
+        self._message_bucket = None
+        if server.settings['max_message_rate'] is not None:
+            self._message_bucket = limits.TokenBucket(server.settings['max_message_rate'],
+                                                      server.settings['max_message_burst'])
+
     def set_handler(self, handler):
         """Set transport handler
         ``handler``
@@ -101,6 +165,7 @@ class BaseSession(object):
         if self.conn_info is None:
             self.conn_info = handler.get_conn_info()
             self.stats.on_sess_opened(self.transport_name)
+            self.server.admission.on_opened(self.conn_info.ip)
 
         return True
 
@@ -137,21 +202,205 @@ class BaseSession(object):
             except:
                 LOG.debug("Failed to call on_close().", exc_info=True)
             finally:
+                self.server.unsubscribe_all(self.conn)
+
                 self.state = CLOSED
                 self.close_reason = (code, message)
                 self.conn = None
 
             # Bump stats
             self.stats.on_sess_closed(self.transport_name)
+            self.server.admission.on_closed(self.conn_info.ip)
+
+            if self.paused:
+                self.paused = False
+                self.stats.on_sess_resumed()
 
             # If we have active handler, notify that session was closed
             if self.handler is not None:
                 self.handler.session_closed()
 
-    def delayed_close(self):
-        """Delayed close - won't close immediately, but on next ioloop tick."""
+    def check_size(self, size):
+        """Check size of the incoming data before decoding it. If it is above
+        `max_message_size` setting, session is closed and False is returned.
+
+        `size`
+            Data size, in bytes
+        """
+        if self._max_message_size is not None and size > self._max_message_size:
+            return self._limit_exceeded('size', limits.CLOSE_TOO_BIG)
+
+        return True
+
+    def check_rate(self, count):
+        """Check batch of `count` incoming messages against `max_batch_length`
+        and `max_message_rate` settings. If limit was exceeded, session is
+        closed and False is returned.
+
+        `count`
+            Number of messages
+        """
+        if self._max_batch_length is not None and count > self._max_batch_length:
+            return self._limit_exceeded('batch', limits.CLOSE_POLICY)
+
+        if self._message_bucket is not None and not self._message_bucket.consume(count):
+            return self._limit_exceeded('rate', limits.CLOSE_POLICY)
+
+        return True
+
+    @property
+    def offload_full(self):
+        """Check if session has `max_offload_pending` messages waiting for
+        the connection executor"""
+        return (self._max_offload_pending is not None
+                and len(self._offloaded) >= self._max_offload_pending)
+
+    @property
+    def inbound_paused(self):
+        """Check if session should stop accepting incoming messages: it has
+        asynchronous `on_message` handler and all handler slots are taken,
+        or too many messages are waiting for the connection executor."""
+        return ((self.async_handler and self.server.handler_slots.full)
+                or self.offload_full)
+
+    def wait_inbound(self):
+        """Return Future, which is resolved once all queued incoming messages
+        were handled (or, with connection executor, once number of pending
+        messages drops below `max_offload_pending`), or None if session can
+        accept more messages right away."""
+        if not self._inbound_running and not self.offload_full:
+            return None
+
+        if self._inbound_drained is None:
+            self._inbound_drained = Future()
+        return self._inbound_drained
+
+    def _dispatch(self, msg_list):
+        """Pass incoming messages to the connection `on_message`. If handler
+        returns awaitable, following messages wait until it completes."""
+        if self.conn.executor is not None:
+            self._offload(msg_list)
+            return
+
+        if self._inbound_running or self.async_handler:
+            self._inbound.extend(msg_list)
+
+            if not self._inbound_running:
+                self._run_inbound()
+            return
+
+        for n, msg in enumerate(msg_list):
+            if self.state != OPEN:
+                return
+
+            result = self.conn.on_message(msg)
+
+            if result is not None and _is_awaitable(result):
+                self.async_handler = True
+                self._inbound.extend(msg_list[n + 1:])
+                self._run_inbound(result)
+                return
+
+    def _offload(self, msg_list):
+        """Submit incoming messages to the connection executor"""
+        conn = self.conn
+        io_loop = self.server.io_loop
+
+        for msg in msg_list:
+            f = conn.executor.submit(_timed_call, conn.process_message, msg)
+            self._offloaded.append(f)
+            self.stats.on_offload_submitted()
+
+            io_loop.add_future(f, self._on_offloaded)
+
+    def _on_offloaded(self, f):
+        """Deliver completed executor results to the connection. Results
+        which completed out of order wait for the earlier ones."""
+        if f.exception() is None:
+            self.stats.on_offload_done(f.result()[1])
+        else:
+            self.stats.on_offload_done(None)
+
+        queue = self._offloaded
+        while queue and queue[0].done():
+            f = queue.popleft()
+
+            if self.state != OPEN:
+                continue
+
+            try:
+                self.conn.on_result(f.result()[0])
+            except Exception:
+                LOG.exception('Failed to handle incoming message')
+                queue.clear()
+                self.close()
+
+        drained = self._inbound_drained
+        if drained is not None and not self.offload_full:
+            self._inbound_drained = None
+            drained.set_result(None)
+
+    @gen.coroutine
+    def _run_inbound(self, pending=None):
+        """Handle queued incoming messages one by one. Each `on_message` call
+        takes a slot from the router `handler_slots`.
+
+        `pending`
+            Awaitable returned by the `on_message` called from `_dispatch`
+        """
+        self._inbound_running = True
+
+        inbound = self._inbound
+        slots = self.server.handler_slots
+
+        try:
+            if pending is not None:
+                yield pending
+
+            while inbound and self.state == OPEN:
+                yield slots.acquire()
+
+                try:
+                    # Session might get closed while waiting for a slot
+                    if self.state != OPEN:
+                        break
+
+                    result = self.conn.on_message(inbound.popleft())
+                    if result is not None and _is_awaitable(result):
+                        yield result
+                finally:
+                    slots.release()
+        except Exception:
+            LOG.exception('Failed to handle incoming message')
+            self.close()
+        finally:
+            inbound.clear()
+            self._inbound_running = False
+
+            drained = self._inbound_drained
+            if drained is not None:
+                self._inbound_drained = None
+                drained.set_result(None)
+
+    def _limit_exceeded(self, limit, reason):
+        """Close session which went above inbound limit"""
+        LOG.debug('Session went above %s limit, closing' % limit)
+
+        self.stats.on_limit_exceeded(limit)
+        self.close(*reason)
+
+        return False
+
+    def delayed_close(self, code=3000, message='Go away!'):
+        """Delayed close - won't close immediately, but on next ioloop tick.
+
+        `code`
+            Closing code
+        `message`
+            Close message
+        """
         self.state = CLOSING
-        self.server.io_loop.add_callback(self.close)
+        self.server.io_loop.add_callback(self.close, code, message)
 
     def get_close_reason(self):
         """Return last close reason tuple.
@@ -179,6 +428,8 @@ class BaseSession(object):
             Message to send
         `stats`
             If set to True, will update statistics after operation completes
+        `binary`
+            If set to True, message is sent as binary
         """
         raise NotImplemented()
 
@@ -204,6 +455,59 @@ class BaseSession(object):
         """
         self.server.broadcast(clients, msg)
 
+    # Flow control
+    @property
+    def tracks_buffer(self):
+        """Check if transport should report its write buffer size"""
+        return self._high_watermark is not None or self.send_queue_limit is not None
+
+    def on_buffered(self, size):
+        """Called by the transport when data was passed to the underlying stream.
+
+        `size`
+            Amount of bytes
+        """
+        self.send_buffer_size += size
+        self.stats.on_bytes_queued(size)
+
+        self.check_watermarks()
+
+    def on_written(self, size):
+        """Called by the transport when buffered data was written to the socket.
+
+        `size`
+            Amount of bytes
+        """
+        self.send_buffer_size -= size
+        self.stats.on_bytes_dequeued(size)
+
+        self.check_watermarks()
+
+    def check_watermarks(self):
+        """Pause or resume connection depending on amount of pending outgoing data"""
+        if self._high_watermark is None or self.conn is None:
+            return
+
+        size = self.send_queue_size + self.send_buffer_size
+
+        if self.paused:
+            if size <= self._low_watermark:
+                self.paused = False
+                self.stats.on_sess_resumed()
+
+                try:
+                    self.conn.on_drain()
+                except Exception:
+                    LOG.exception('Failed to call on_drain().')
+        elif size >= self._high_watermark:
+            self.paused = True
+            self.stats.on_sess_paused()
+
+            try:
+                self.conn.on_pause()
+            except Exception:
+                LOG.exception('Failed to call on_pause().')
+
 
 class Session(BaseSession, sessioncontainer.SessionMixin):
     """SockJS session implementation.
@@ -225,16 +529,27 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
         sessioncontainer.SessionMixin.__init__(self, session_id, expiry)
         BaseSession.__init__(self, conn, server)
 
-        self.send_queue = ''
+        # Outgoing JSON-encoded messages (as bytes), joined once on flush
+        self.send_queue = deque()
         self.send_expects_json = True
 
-        # Heartbeat related stuff
-        self._heartbeat_timer = None
-        self._heartbeat_interval = self.server.settings['heartbeat_delay'] * 1000
+        # Set by the transport if client can receive binary websocket frames
+        self.binary = False
+
+        # Slow consumer handling
+        self._policy = self.server.slow_consumer_policy
+        if self.conn.slow_consumer_policy is not None:
+            self._policy = policy.get_policy(self.conn.slow_consumer_policy)
 
         self._immediate_flush = self.server.settings['immediate_flush']
         self._pending_flush = False
 
+        # Polling linger window
+        self._linger = self.server.settings['polling_linger']
+        self._linger_size = self.server.settings['polling_linger_size']
+        self._linger_deadline = None
+        self._linger_timeout = None
+
         self._verify_ip = self.server.settings['verify_ip']
 
     # Session callbacks
@@ -251,6 +566,9 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
         else:
             self.close()
 
+            # Session won't be attached anymore, drop pending messages
+            self.discard_queue()
+
     # Add session
     def set_handler(self, handler, start_heartbeat=True):
         """Set active handler for the session
@@ -310,6 +628,7 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
 
         self.promote()
         self.stop_heartbeat()
+        self._stop_linger()
 
     def send_message(self, msg, stats=True, binary=False):
         """Send or queue outgoing message
@@ -318,33 +637,65 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
             Message to send
         `stats`
             If set to True, will update statistics after operation completes
+        `binary`
+            If set to True, message is sent as binary
         """
-        self.send_jsonified(proto.json_encode(bytes_to_str(msg)), stats)
+        if binary:
+            self.send_binary(msg, stats)
+        else:
+            self.send_jsonified(self.server.codec.encode_bytes(bytes_to_str(msg)), stats)
 
-    def send_jsonified(self, msg, stats=True):
+    def send_binary(self, msg, stats=True):
+        """Send binary message. If client negotiated binary frames, message
+        is sent as binary websocket frame. Otherwise it is sent as
+        base64-encoded string message.
+
+        `msg`
+            Message to send (bytes)
+        `stats`
+            If set to True, will update statistics after operation completes
+        """
+        msg = str_to_bytes(msg)
+
+        if self.binary:
+            self._send(BinaryMessage(msg), stats)
+        else:
+            self._send(b'"' + base64.b64encode(msg) + b'"', stats)
+
+    def send_jsonified(self, msg, stats=True, frame=None):
         """Send JSON-encoded message
 
         `msg`
             JSON encoded string to send
         `stats`
             If set to True, will update statistics after operation completes
+        `frame`
+            Optional `sockjs.tornado.websocket.PreparedMessage` with the same
+            message, prepared by `broadcast`
         """
-        msg = bytes_to_str(msg)
-
-        if self._immediate_flush:
-            if self.handler and self.handler.active and not self.send_queue:
+        self._send(str_to_bytes(msg), stats, frame)
+
+    def _send(self, msg, stats, frame=None):
+        """Send or queue JSON-encoded or `BinaryMessage` message"""
+        immediate = self._immediate_flush
+        if immediate == 'adaptive':
+            immediate = not self.server.flush_batched
+
+        if immediate:
+            if (self.handler and self.handler.active and not self.send_queue
+                    and not self._buffer_full(len(msg))
+                    and not (self._linger and self.handler.lingers)):
                 # Send message right away
-                self.handler.send_pack('a[%s]' % msg)
+                if isinstance(msg, BinaryMessage):
+                    self.handler.send_pack(msg, binary=True)
+                elif frame is None or not self.handler.send_frame(frame):
+                    self.handler.send_pack(proto.MESSAGES % msg)
+                self.delay_heartbeat()
             else:
-                if self.send_queue:
-                    self.send_queue += ','
-                self.send_queue += msg
-
+                self._enqueue(msg)
                 self.flush()
         else:
-            if self.send_queue:
-                self.send_queue += ','
-            self.send_queue += msg
+            self._enqueue(msg)
 
             if not self._pending_flush:
                 self.server.io_loop.add_callback(self.flush)
@@ -353,6 +704,67 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
         if stats:
             self.stats.on_pack_sent(1)
 
+    def _buffer_full(self, size):
+        """Check if transport buffer has no room for `size` more bytes"""
+        return (self.send_queue_limit is not None
+                and self.send_buffer_size + size > self.send_queue_limit)
+
+    def _enqueue(self, msg):
+        """Add JSON-encoded message to the send queue"""
+        size = len(msg)
+
+        if (self.send_queue_limit is not None
+                and self.send_queue_size + self.send_buffer_size + size > self.send_queue_limit):
+            if not self._policy.on_overflow(self, msg):
+                return
+
+        self.send_queue.append(msg)
+        self.send_queue_size += size
+        self.stats.on_bytes_queued(size)
+
+        self.check_watermarks()
+
+    def discard_queue(self):
+        """Drop all queued outgoing messages"""
+        if self.send_queue_size:
+            self.stats.on_bytes_dequeued(self.send_queue_size)
+
+        self.send_queue = deque()
+        self.send_queue_size = 0
+
+    def drop_oldest(self):
+        """Drop oldest queued message"""
+        size = len(self.send_queue.popleft())
+
+        self.send_queue_size -= size
+        self.stats.on_bytes_dequeued(size)
+
+    def replace_queue(self, messages):
+        """Replace queued messages
+
+        `messages`
+            List of JSON-encoded messages
+        """
+        self.discard_queue()
+
+        for msg in messages:
+            self.send_queue.append(msg)
+            self.send_queue_size += len(msg)
+
+        self.stats.on_bytes_queued(self.send_queue_size)
+
+    def on_written(self, size):
+        """Called by the transport when buffered data was written to the socket.
+
+        `size`
+            Amount of bytes
+        """
+        super(Session, self).on_written(size)
+
+        # Flush messages which were held back because of full buffer
+        if self.send_queue:
+            self.flush()
+
     def flush(self):
         """Flush message queue if there's an active connection running"""
         self._pending_flush = False
@@ -360,8 +772,69 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
         if self.handler is None or not self.handler.active or not self.send_queue:
             return
 
-        self.handler.send_pack('a[%s]' % self.send_queue)
-        self.send_queue = ''
+        if self.send_buffer_size and self._buffer_full(0):
+            return
+
+        if self._linger and self.handler.lingers and self._should_linger():
+            return
+
+        self._stop_linger()
+
+        queue = self.send_queue
+        self.discard_queue()
+
+        if not self.binary:
+            self.handler.send_pack(proto.MESSAGES % b','.join(queue))
+        else:
+            self._send_mixed(queue)
+
+        # Data frame works as a heartbeat as well
+        self.delay_heartbeat()
+
+        self.check_watermarks()
+
+    def _should_linger(self):
+        """Check if messages should be held back for the polling transport"""
+        if self._linger_size is not None and self.send_queue_size >= self._linger_size:
+            return False
+
+        io_loop = self.server.io_loop
+
+        if self._linger_deadline is None:
+            self._linger_deadline = io_loop.time() + self._linger / 1000.0
+            self._linger_timeout = io_loop.call_at(self._linger_deadline, self._on_linger)
+            return True
+
+        return io_loop.time() < self._linger_deadline
+
+    def _on_linger(self):
+        self._linger_timeout = None
+        self.flush()
+
+    def _stop_linger(self):
+        """Reset linger window"""
+        if self._linger_timeout is not None:
+            self.server.io_loop.remove_timeout(self._linger_timeout)
+            self._linger_timeout = None
+
+        self._linger_deadline = None
+
+    def _send_mixed(self, queue):
+        """Send queue which might contain binary messages, preserving order"""
+        batch = []
+
+        for msg in queue:
+            if isinstance(msg, BinaryMessage):
+                if batch:
+                    self.handler.send_pack(proto.MESSAGES % b','.join(batch))
+                    batch = []
+
+                self.handler.send_pack(msg, binary=True)
+            else:
+                batch.append(msg)
+
+        if batch:
+            self.handler.send_pack(proto.MESSAGES % b','.join(batch))
 
     def close(self, code=3000, message='Go away!'):
         """Close session.
@@ -378,26 +851,22 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
 
         super(Session, self).close(code, message)
 
+        # Unregistered sessions (websocket) can't be attached again
+        if self.server.get_session(self.session_id) is not self:
+            self.discard_queue()
+
     # Heartbeats
     def start_heartbeat(self):
         """Reset hearbeat timer"""
-        self.stop_heartbeat()
-
-        self._heartbeat_timer = periodic.Callback(self._heartbeat,
-                                                  self._heartbeat_interval,
-                                                  self.server.io_loop)
-        self._heartbeat_timer.start()
+        self.server.heartbeats.start(self)
 
     def stop_heartbeat(self):
         """Stop active heartbeat"""
-        if self._heartbeat_timer is not None:
-            self._heartbeat_timer.stop()
-            self._heartbeat_timer = None
+        self.server.heartbeats.stop(self)
 
     def delay_heartbeat(self):
         """Delay active heartbeat"""
-        if self._heartbeat_timer is not None:
-            self._heartbeat_timer.delay()
+        self.server.heartbeats.delay(self)
 
     def _heartbeat(self):
         """Heartbeat callback"""
@@ -407,13 +876,17 @@ class Session(BaseSession, sessioncontainer.SessionMixin):
             self.stop_heartbeat()
 
     def on_messages(self, msg_list):
-        """Handle incoming messages
+        """Handle incoming messages. Returns False if messages were dropped
+        because session went above inbound limits.
 
         `msg_list`
             Message list to process
         """
+        if not self.check_rate(len(msg_list)):
+            return False
+
         self.stats.on_pack_recv(len(msg_list))
 
-        for msg in msg_list:
-            if self.state == OPEN:
-                self.conn.on_message(msg)
+        self._dispatch(msg_list)
+
+        return True
@@ -4,10 +4,12 @@
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     Simple heapq-based session implementation with sliding expiration window
-    support.
+    support. Also contains timing wheel based container, which scales better
+    when there are lots of polling sessions.
 """
 
 from heapq import heappush, heappop
+from math import ceil
 from time import time
 from hashlib import md5
 from random import random
@@ -157,3 +159,95 @@ class SessionContainer(object):
                 heappush(self._queue, top)
             else:
                 del self._items[top.session_id]
+
+
+class TimingWheelSessionContainer(SessionContainer):
+    """Timing wheel session container.
+
+    Sessions are bucketed by expiration second. Promoting a session is just an
+    attribute assignment and every promoted session is moved to its new bucket
+    at most once per expiration period, so `expire` only touches sessions
+    which are due instead of doing heap operations for each of them.
+    """
+    def __init__(self):
+        self._items = dict()
+        self._buckets = dict()
+        self._cursor = None
+
+    def _schedule(self, session):
+        slot = int(ceil(session.expiry_date))
+
+        # Never schedule into the past, otherwise session will be lost
+        if self._cursor is not None and slot < self._cursor:
+            slot = self._cursor
+
+        bucket = self._buckets.get(slot)
+        if bucket is None:
+            self._buckets[slot] = [session]
+        else:
+            bucket.append(session)
+
+    def add(self, session):
+        """Add session to the container.
+
+        `session`
+            Session object
+        """
+        self._items[session.session_id] = session
+
+        if session.expiry is not None:
+            self._schedule(session)
+
+    def expire(self, current_time=None):
+        """Expire any old entries
+
+        `current_time`
+            Optional time to be used to clean up queue (can be used in unit tests)
+        """
+        if not self._buckets:
+            return
+
+        if current_time is None:
+            current_time = time()
+
+        if self._cursor is None:
+            self._cursor = min(self._buckets)
+
+        items = self._items
+        buckets = self._buckets
+        now_slot = int(current_time)
+
+        while self._cursor <= now_slot:
+            bucket = buckets.pop(self._cursor, None)
+            self._cursor += 1
+
+            if bucket is None:
+                continue
+
+            for top in bucket:
+                # Session was explicitly removed from the container
+                if items.get(top.session_id) is not top:
+                    continue
+
+                need_reschedule = (top.promoted is not None
+                                   and top.promoted > current_time)
+
+                # Give chance to reschedule
+                if not need_reschedule:
+                    top.promoted = None
+                    top.on_delete(False)
+
+                    need_reschedule = (top.promoted is not None
+                                       and top.promoted > current_time)
+
+                if need_reschedule:
+                    top.expiry_date = top.promoted
+                    top.promoted = None
+                    self._schedule(top)
+                else:
+                    del items[top.session_id]
+
+            if not buckets:
+                # Nothing left, restart from the first bucket added later
+                self._cursor = None
+                break
@@ -14,7 +14,6 @@ import sys
 from sockjs.tornado.util import asynchronous
 
 from sockjs.tornado.basehandler import BaseHandler, PreflightHandler
-from sockjs.tornado.proto import json_encode
 from sockjs.tornado.util import MAXSIZE, str_to_bytes
 
 IFRAME_TEXT = '''<!DOCTYPE html>
@@ -34,13 +33,39 @@ IFRAME_TEXT = '''<!DOCTYPE html>
 </body>
 </html>'''.strip()
 
+GREETING_TEXT = b'Welcome to SockJS!\n'
+
+
+class StaticResponses(object):
+    """Responses of the static handlers, rendered once per router."""
+    def __init__(self, server):
+        """Constructor.
+
+        `server`
+            SockJSRouter instance
+        """
+        self.iframe = str_to_bytes(IFRAME_TEXT % server.settings['sockjs_url'])
+        self.iframe_etag = hashlib.md5(self.iframe).hexdigest()
+
+        # /info response up to the entropy value, which is generated for
+        # each request
+        encode = server.codec.encode_bytes
+
+        self._info_prefix = (b'{"websocket":' + encode(server.websockets_enabled) +
+                             b',"cookie_needed":' + encode(server.cookie_needed) +
+                             b',"origins":' + encode(['*:*']) +
+                             b',"entropy":')
+
+    def info(self):
+        """Return /info response body with new entropy value"""
+        return self._info_prefix + str_to_bytes(str(random.randint(0, MAXSIZE))) + b'}'
+
 
 class IFrameHandler(BaseHandler):
     """SockJS IFrame page handler"""
     def get(self):
-        data = str_to_bytes(IFRAME_TEXT % self.server.settings['sockjs_url'])
-
-        hsh = hashlib.md5(data).hexdigest()
+        responses = self.server.static_responses
+        hsh = responses.iframe_etag
 
         value = self.request.headers.get('If-None-Match')
         if value:
@@ -56,7 +81,7 @@ class IFrameHandler(BaseHandler):
         self.enable_cache()
 
         self.set_header('Etag', hsh)
-        self.write(data)
+        self.write(responses.iframe)
 
 
 class GreetingsHandler(BaseHandler):
@@ -69,7 +94,7 @@ class GreetingsHandler(BaseHandler):
         self.enable_cache()
 
         self.set_header('Content-Type', 'text/plain; charset=UTF-8')
-        self.write('Welcome to SockJS!\n')
+        self.write(GREETING_TEXT)
 
 
 class ChunkingTestHandler(PreflightHandler):
@@ -123,11 +148,13 @@ class InfoHandler(PreflightHandler):
     def get(self):
         self.preflight()
         self.disable_cache()
-        self.set_header('Content-Type', 'application/json; charset=UTF-8')
 
-        options = dict(websocket=self.server.websockets_enabled,
-                       cookie_needed=self.server.cookie_needed,
-                       origins=['*:*'],
-                       entropy=random.randint(0, MAXSIZE))
+        # Shed load before client picks a transport
+        admission = self.server.admission
+        if admission.check(self.request.remote_ip, consume=False) is not None:
+            admission.reject(self)
+            return
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
 
-        self.write(json_encode(options))
+        self.write(self.server.static_responses.info())
@@ -66,6 +66,45 @@ class StatsCollector(object):
         self.pack_sent_ps = MovingAverage()
         self.pack_recv_ps = MovingAverage()
 
+        # Heartbeats
+        self.heartbeats_suppressed = 0
+
+        # Outgoing flow control
+        self.bytes_queued = 0
+        self.sess_paused = 0
+
+        # Dropped outgoing messages, by slow consumer policy name
+        self.msg_dropped = dict()
+
+        # Topics
+        self.topic_fanout = dict()
+
+        # Duration of the last incremental broadcast, in milliseconds
+        self.broadcast_time = 0
+
+        # Outgoing compression, per transport
+        self.bytes_raw = dict()
+        self.bytes_compressed = dict()
+
+        # Rejected sessions, by reason
+        self.sess_rejected = dict()
+
+        # Sessions closed for going above inbound limits, by limit
+        self.limit_exceeded = dict()
+
+        # Executor offload: messages submitted and not completed yet and
+        # average execution time during the last second, in milliseconds
+        self.offload_pending = 0
+        self.offload_time = 0
+        self._offload_time_sum = 0
+        self._offload_count = 0
+
+        # Adaptive flush mode and last measured IOLoop lag, in milliseconds.
+        # Only reported when router runs with adaptive flush.
+        self.adaptive_flush = False
+        self.flush_batched = False
+        self.loop_lag = 0
+
         self._callback = ioloop.PeriodicCallback(self._update,
                                                  1000)
         self._callback.start()
@@ -76,6 +115,13 @@ class StatsCollector(object):
         self.pack_sent_ps.flush()
         self.pack_recv_ps.flush()
 
+        if self._offload_count:
+            self.offload_time = self._offload_time_sum / self._offload_count * 1000
+            self._offload_time_sum = 0
+            self._offload_count = 0
+        else:
+            self.offload_time = 0
+
     def dump(self):
         """Return dictionary with current statistical information"""
         data = dict(
@@ -88,12 +134,48 @@ class StatsCollector(object):
 
             # Packets
             packets_sent_ps=self.pack_sent_ps.last_average,
-            packets_recv_ps=self.pack_recv_ps.last_average
+            packets_recv_ps=self.pack_recv_ps.last_average,
+
+            # Heartbeats
+            heartbeats_suppressed=self.heartbeats_suppressed,
+
+            # Flow control
+            bytes_queued=self.bytes_queued,
+            sessions_paused=self.sess_paused,
+
+            # Broadcast
+            broadcast_time=self.broadcast_time,
+
+            # Executor offload
+            offload_pending=self.offload_pending,
+            offload_time=self.offload_time
             )
 
+        if self.adaptive_flush:
+            data['flush_mode'] = 'batched' if self.flush_batched else 'immediate'
+            data['loop_lag'] = self.loop_lag
+
         for k, v in self.sess_transports.items():
             data['transp_' + k] = v
 
+        for k, v in self.sess_rejected.items():
+            data['rejected_' + k] = v
+
+        for k, v in self.limit_exceeded.items():
+            data['limit_' + k] = v
+
+        for k, v in self.msg_dropped.items():
+            data['dropped_' + k] = v
+
+        for k, v in self.topic_fanout.items():
+            data['fanout_%s' % k] = v
+
+        for k, v in self.bytes_raw.items():
+            data['bytes_raw_' + k] = v
+
+        for k, v in self.bytes_compressed.items():
+            data['bytes_compressed_' + k] = v
+
         return data
 
     # Various event callbacks
@@ -109,6 +191,12 @@ class StatsCollector(object):
         self.sess_active -= 1
         self.sess_transports[transport] -= 1
 
+    def on_sess_rejected(self, reason):
+        self.sess_rejected[reason] = self.sess_rejected.get(reason, 0) + 1
+
+    def on_limit_exceeded(self, limit):
+        self.limit_exceeded[limit] = self.limit_exceeded.get(limit, 0) + 1
+
     def on_conn_opened(self):
         self.conn_active += 1
         self.conn_ps.add(1)
@@ -121,3 +209,48 @@ class StatsCollector(object):
 
     def on_pack_recv(self, num):
         self.pack_recv_ps.add(num)
+
+    def on_heartbeat_suppressed(self, num):
+        self.heartbeats_suppressed += num
+
+    def on_bytes_queued(self, num):
+        self.bytes_queued += num
+
+    def on_bytes_dequeued(self, num):
+        self.bytes_queued -= num
+
+    def on_sess_paused(self):
+        self.sess_paused += 1
+
+    def on_sess_resumed(self):
+        self.sess_paused -= 1
+
+    def on_msg_dropped(self, policy, num):
+        self.msg_dropped[policy] = self.msg_dropped.get(policy, 0) + num
+
+    def on_topic_published(self, topic, num):
+        self.topic_fanout[topic] = self.topic_fanout.get(topic, 0) + num
+
+    def on_topic_removed(self, topic):
+        self.topic_fanout.pop(topic, None)
+
+    def on_broadcast_done(self, elapsed):
+        self.broadcast_time = elapsed * 1000
+
+    def on_bytes_compressed(self, transport, raw, compressed):
+        self.bytes_raw[transport] = self.bytes_raw.get(transport, 0) + raw
+        self.bytes_compressed[transport] = self.bytes_compressed.get(transport, 0) + compressed
+
+    def on_loop_lag(self, lag, batched):
+        self.loop_lag = lag * 1000
+        self.flush_batched = batched
+
+    def on_offload_submitted(self):
+        self.offload_pending += 1
+
+    def on_offload_done(self, elapsed):
+        self.offload_pending -= 1
+
+        if elapsed is not None:
+            self._offload_time_sum += elapsed
+            self._offload_count += 1
@@ -9,6 +9,10 @@ class BaseTransportMixin(object):
 
     name = 'override_me_please'
 
+    # Set for polling transports, which finish response after first data
+    # frame. Session holds messages for them for `polling_linger` milliseconds.
+    lingers = False
+
     def get_conn_info(self):
         """Return `ConnectionInfo` object from current transport"""
         return session.ConnectionInfo(self.request.remote_ip,
@@ -20,3 +24,8 @@ class BaseTransportMixin(object):
     def session_closed(self):
         """Called by the session, when it gets closed"""
         pass
+
+    def send_frame(self, frame):
+        """Send `sockjs.tornado.websocket.PreparedMessage`. Returns False if
+        transport can not send prepared frames."""
+        return False
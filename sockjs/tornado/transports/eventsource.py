@@ -22,10 +22,12 @@ class EventSourceTransport(streamingbase.StreamingTransportBase):
         self.disable_cache()
 
         self.set_header('Content-Type', 'text/event-stream; charset=UTF-8')
-        self.write('\r\n')
+        self.enable_compression()
+
+        self.write_stream(b'\r\n')
         self.flush()
 
-        if not self._attach_session(session_id):
+        if not self._attach_session(session_id, True):
             self.finish()
             return
 
@@ -36,14 +38,12 @@ class EventSourceTransport(streamingbase.StreamingTransportBase):
         if binary:
             raise Exception('binary not supported for EventSourceTransport')
 
-        msg = 'data: %s\r\n\r\n' % message
+        msg = b'data: ' + message + b'\r\n\r\n'
 
         self.active = False
 
         try:
-            self.notify_sent(len(msg))
-
-            self.write(msg)
+            self.notify_sent(self.write_stream(msg))
             self.flush().add_done_callback(self.send_complete)
         except IOError:
             # If connection dropped, make sure we close offending session instead
@@ -8,9 +8,8 @@
 
 import re
 
-from sockjs.tornado import proto
 from sockjs.tornado.transports import streamingbase
-from sockjs.tornado.util import asynchronous
+from sockjs.tornado.util import asynchronous, bytes_to_str
 
 try:
     # Python 3.4+
@@ -41,6 +40,8 @@ HTMLFILE_HEAD = r'''
 HTMLFILE_HEAD += ' ' * (1024 - len(HTMLFILE_HEAD) + 14)
 HTMLFILE_HEAD += '\r\n\r\n'
 
+HTMLFILE_FRAME = b'<script>\np(%s);\n</script>\r\n'
+
 
 class HtmlFileTransport(streamingbase.StreamingTransportBase):
     name = 'htmlfile'
@@ -65,17 +66,19 @@ class HtmlFileTransport(streamingbase.StreamingTransportBase):
             return
 
         if CALLBACK_RE.search(callback):
-             self.write('invalid "callback" parameter')
+            self.write('invalid "callback" parameter')
             self.set_status(500)
             self.finish()
             return
 
+        self.enable_compression()
+
         # TODO: Fix me - use parameter
-        self.write(HTMLFILE_HEAD % escape(RE.sub('', callback)))
+        self.write_stream(HTMLFILE_HEAD % escape(RE.sub('', callback)))
         self.flush()
 
         # Now try to attach to session
-        if not self._attach_session(session_id):
+        if not self._attach_session(session_id, True):
             self.finish()
             return
 
@@ -88,14 +91,12 @@ class HtmlFileTransport(streamingbase.StreamingTransportBase):
             raise Exception('binary not supported for HtmlFileTransport')
 
         # TODO: Just do escaping
-        msg = '<script>\np(%s);\n</script>\r\n' % proto.json_encode(message)
+        msg = HTMLFILE_FRAME % self.server.codec.encode_bytes(bytes_to_str(message))
 
         self.active = False
 
         try:
-            self.notify_sent(len(message))
-
-            self.write(msg)
+            self.notify_sent(self.write_stream(msg))
             self.flush().add_done_callback(self.send_complete)
         except IOError:
             # If connection dropped, make sure we close offending session instead
@@ -9,14 +9,14 @@ import logging
 
 from sockjs.tornado.util import asynchronous
 
-from sockjs.tornado import proto
 from sockjs.tornado.transports import pollingbase
-from sockjs.tornado.util import bytes_to_str, unquote_plus
+from sockjs.tornado.util import bytes_to_str, str_to_bytes, unquote_plus_bytes
 
 LOG = logging.getLogger("tornado.general")
 
 class JSONPTransport(pollingbase.PollingTransportBase):
     name = 'jsonp'
+    lingers = True
 
     @asynchronous
     def get(self, session_id):
@@ -25,13 +25,15 @@ class JSONPTransport(pollingbase.PollingTransportBase):
         self.disable_cache()
 
         # Grab callback parameter
-        self.callback = self.get_argument('c', None)
-        if not self.callback:
+        callback = self.get_argument('c', None)
+        if not callback:
             self.write('"callback" parameter required')
             self.set_status(500)
             self.finish()
             return
 
+        self.callback = str_to_bytes(callback)
+
         # Get or create session without starting heartbeat
         if not self._attach_session(session_id, False):
             return
@@ -53,7 +55,7 @@ class JSONPTransport(pollingbase.PollingTransportBase):
 
         try:
             # TODO: Just escape
-            msg = '%s(%s);\r\n' % (self.callback, proto.json_encode(message))
+            msg = b'%s(%s);\r\n' % (self.callback, self.server.codec.encode_bytes(bytes_to_str(message)))
 
             self.set_header('Content-Type', 'application/javascript; charset=UTF-8')
             self.set_header('Content-Length', len(msg))
@@ -81,18 +83,33 @@ class JSONPSendHandler(pollingbase.PollingTransportBase):
             self.set_status(404)
             return
 
-        data = bytes_to_str(self.request.body)
+        # Handler slots are taken or executor queue is full, client should retry
+        if session.inbound_paused:
+            self.write("Server busy.")
+            self.set_header('Retry-After', '1')
+            self.set_status(429)
+            return
+
+        data = self.request.body
+        if not session.check_size(len(data)):
+            self.write("Message too big.")
+            self.set_status(413)
+            return
 
         ctype = self.request.headers.get('Content-Type', '').lower()
         if ctype == 'application/x-www-form-urlencoded':
-            if not data.startswith('d='):
+            if not data.startswith(b'd='):
                 LOG.exception('jsonp_send: Invalid payload.')
 
                 self.write("Payload expected.")
                 self.set_status(500)
                 return
 
-            data = unquote_plus(data[2:])
+            if b'%' in data or b'+' in data:
+                data = unquote_plus_bytes(data[2:])
+            else:
+                # Nothing to unquote, decode payload in place
+                data = memoryview(data)[2:]
 
         if not data:
             LOG.debug('jsonp_send: Payload expected.')
@@ -102,7 +119,7 @@ class JSONPSendHandler(pollingbase.PollingTransportBase):
             return
 
         try:
-            messages = proto.json_decode(data)
+            messages = self.server.codec.decode(data)
         except:
             # TODO: Proper error handling
             LOG.debug('jsonp_send: Invalid json encoding')
@@ -112,7 +129,11 @@ class JSONPSendHandler(pollingbase.PollingTransportBase):
             return
 
         try:
-            session.on_messages(messages)
+            # Session was closed, client should not retry
+            if not session.on_messages(messages):
+                self.write("Message limit exceeded.")
+                self.set_status(403)
+                return
         except Exception:
             LOG.exception('jsonp_send: on_message() failed')
 
@@ -6,7 +6,7 @@
     Polling transports base
 """
 
-from sockjs.tornado import basehandler
+from sockjs.tornado import basehandler, limits, proto
 from sockjs.tornado.transports import base
 
 
@@ -25,6 +25,11 @@ class PollingTransportBase(basehandler.PreflightHandler, base.BaseTransportMixin
         session = self._get_session(session_id)
 
         if session is None:
+            # Refuse new session if server is overloaded
+            if self.server.admission.check(self.request.remote_ip) is not None:
+                self.send_pack(proto.disconnect(*limits.CLOSE_OVERLOADED))
+                return False
+
             session = self.server.create_session(session_id)
 
         # Try to attach to the session
@@ -20,7 +20,8 @@ class RawSession(session.BaseSession):
         self.handler.send_pack(msg, binary)
 
     def on_message(self, msg):
-        self.conn.on_message(msg)
+        if self.check_rate(1):
+            self._dispatch((msg,))
 
 
 class RawWebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMixin):
@@ -64,6 +65,10 @@ class RawWebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransport
             # Close running connection
             self.abort_connection()
 
+        # Pause reading until asynchronous handler is done with the message
+        if self.session is not None:
+            return self.session.wait_inbound()
+
     def on_close(self):
         # Close session if websocket connection was closed
         if self.session is not None:
@@ -77,9 +82,12 @@ class RawWebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransport
     def send_pack(self, message, binary=False):
         # Send message
         try:
-            self.write_message(message, binary)
+            f, size = self.write_data(message, binary)
         except IOError:
             self.server.io_loop.add_callback(self.on_close)
+            return
+
+        self.track_write(f, size)
 
     def session_closed(self):
         try:
@@ -1,4 +1,7 @@
+import zlib
+
 from sockjs.tornado.transports import pollingbase
+from sockjs.tornado.util import str_to_bytes
 
 
 class StreamingTransportBase(pollingbase.PollingTransportBase):
@@ -7,10 +10,65 @@ class StreamingTransportBase(pollingbase.PollingTransportBase):
 
         self.amount_limit = self.server.settings['response_limit']
 
+        # gzip compressor, if compression was enabled for the response
+        self._gzip = None
+
         # HTTP 1.0 client might send keep-alive
         if hasattr(self.request, 'connection') and not self.request.version == "HTTP/1.1":
             self.request.connection.no_keep_alive = True
 
+    def enable_compression(self):
+        """
+            Enable gzip compression of the response, if it is allowed by the
+            settings and client accepts it. Should be called before anything
+            was written to the response.
+        """
+        settings = self.server.settings
+        if not settings['streaming_compression']:
+            return
+
+        if 'gzip' not in self.request.headers.get('Accept-Encoding', ''):
+            return
+
+        self.set_header('Content-Encoding', 'gzip')
+        self.add_header('Vary', 'Accept-Encoding')
+
+        self._gzip = zlib.compressobj(settings['streaming_compression_level'],
+                                      zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS,
+                                      settings['streaming_compression_mem_level'])
+
+    def write_stream(self, data):
+        """
+            Write data to the response. If compression is enabled, data is
+            compressed and sync-flushed, so client can decode it right away.
+            Returns amount of bytes written.
+
+            `data`
+                Data to write
+        """
+        data = str_to_bytes(data)
+
+        if self._gzip is not None:
+            size = len(data)
+            data = self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+            self.server.stats.on_bytes_compressed(self.name, size, len(data))
+
+        self.write(data)
+        return len(data)
+
+    def finish(self, chunk=None):
+        if self._gzip is not None:
+            if chunk is not None:
+                self.write_stream(chunk)
+                chunk = None
+
+            # Complete gzip stream
+            self.write(self._gzip.flush())
+            self._gzip = None
+
+        super(StreamingTransportBase, self).finish(chunk)
+
     def notify_sent(self, data_len):
         """
             Update amount of data sent
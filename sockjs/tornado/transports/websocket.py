@@ -8,9 +8,8 @@
 import logging
 import socket
 
-from sockjs.tornado import proto, websocket
+from sockjs.tornado import websocket, proto
 from sockjs.tornado.transports import base
-from sockjs.tornado.util import bytes_to_str
 
 LOG = logging.getLogger("tornado.general")
 
@@ -22,6 +21,7 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
         self.server = server
         self.session = None
         self.active = True
+        self.binary = False
 
     def open(self, session_id):
         # Stats
@@ -41,6 +41,8 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
             self.close()
             return
 
+        self.session.binary = self.binary
+
         self.session.verify_state()
 
         if self.session:
@@ -57,7 +59,7 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
             return
 
         try:
-            msg = proto.json_decode(bytes_to_str(message))
+            msg = self.server.codec.decode(message)
 
             if isinstance(msg, list):
                 self.session.on_messages(msg)
@@ -72,6 +74,10 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
             # Close running connection
             self.abort_connection()
 
+        # Pause reading until asynchronous handlers are done with the messages
+        if self.session is not None:
+            return self.session.wait_inbound()
+
     def on_close(self):
         # Close session if websocket connection was closed
         if self.session is not None:
@@ -86,9 +92,26 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
     def send_pack(self, message, binary=False):
         # Send message
         try:
-            self.write_message(message, binary)
+            f, size = self.write_data(message, binary)
+        except IOError:
+            self.server.io_loop.add_callback(self.on_close)
+            return
+
+        self.track_write(f, size)
+
+    def send_frame(self, frame):
+        # Send prepared frame
+        try:
+            f = self.write_frame(frame)
         except IOError:
             self.server.io_loop.add_callback(self.on_close)
+            return True
+
+        if f is None:
+            return False
+
+        self.track_write(f, len(frame.message))
+        return True
 
     def session_closed(self):
         # If session was closed by the application, terminate websocket
@@ -101,6 +124,14 @@ class WebSocketTransport(websocket.SockJSWebSocketHandler, base.BaseTransportMix
             self._detach()
 
     # Websocket overrides
+    def select_subprotocol(self, subprotocols):
+        if (self.server.settings['binary_messages']
+                and proto.BINARY_SUBPROTOCOL in subprotocols):
+            self.binary = True
+            return proto.BINARY_SUBPROTOCOL
+
+        return None
+
     def allow_draft76(self):
         return True
 
@@ -9,15 +9,14 @@ import logging
 
 from sockjs.tornado.util import asynchronous
 
-from sockjs.tornado import proto
 from sockjs.tornado.transports import pollingbase
-from sockjs.tornado.util import bytes_to_str
 
 LOG = logging.getLogger("tornado.general")
 
 class XhrPollingTransport(pollingbase.PollingTransportBase):
     """xhr-polling transport implementation"""
     name = 'xhr'
+    lingers = True
 
     @asynchronous
     def post(self, session_id):
@@ -48,7 +47,7 @@ class XhrPollingTransport(pollingbase.PollingTransportBase):
         try:
             self.set_header('Content-Type', 'application/javascript; charset=UTF-8')
             self.set_header('Content-Length', len(message) + 1)
-            self.write(message + '\n')
+            self.write(message + b'\n')
             self.flush().add_done_callback(self.send_complete)
         except IOError:
             # If connection dropped, make sure we close offending session instead
@@ -68,14 +67,25 @@ class XhrSendHandler(pollingbase.PollingTransportBase):
             self.set_status(404)
             return
 
+        # Handler slots are taken or executor queue is full, client should retry
+        if session.inbound_paused:
+            self.write("Server busy.")
+            self.set_header('Retry-After', '1')
+            self.set_status(429)
+            return
+
         data = self.request.body
+        if not session.check_size(len(data)):
+            self.write("Message too big.")
+            self.set_status(413)
+            return
         if not data:
             self.write("Payload expected.")
             self.set_status(500)
             return
 
         try:
-            messages = proto.json_decode(bytes_to_str(data))
+            messages = self.server.codec.decode(data)
         except:
             # TODO: Proper error handling
             self.write("Broken JSON encoding.")
@@ -83,7 +93,11 @@ class XhrSendHandler(pollingbase.PollingTransportBase):
             return
 
         try:
-            session.on_messages(messages)
+            # Session was closed, client should not retry
+            if not session.on_messages(messages):
+                self.write("Message limit exceeded.")
+                self.set_status(403)
+                return
         except Exception:
             LOG.exception('XHR incoming')
             session.close()
@@ -22,11 +22,13 @@ class XhrStreamingTransport(streamingbase.StreamingTransportBase):
         self.disable_cache()
         self.set_header('Content-Type', 'application/javascript; charset=UTF-8')
 
+        self.enable_compression()
+
         # Send prelude and flush any pending messages
-        self.write('h' * 2048 + '\n')
+        self.write_stream(b'h' * 2048 + b'\n')
         self.flush()
 
-        if not self._attach_session(session_id, False):
+        if not self._attach_session(session_id, True):
             self.finish()
             return
 
@@ -40,9 +42,7 @@ class XhrStreamingTransport(streamingbase.StreamingTransportBase):
         self.active = False
 
         try:
-            self.notify_sent(len(message))
-
-            self.write(message + '\n')
+            self.notify_sent(self.write_stream(message + b'\n'))
             self.flush().add_done_callback(self.send_complete)
         except IOError:
             # If connection dropped, make sure we close offending session instead
@@ -1,4 +1,5 @@
 import sys
+import binascii
 import functools
 import warnings
 from tornado import gen
@@ -20,6 +21,7 @@ if PY3:
 
     import urllib.parse
     unquote_plus = urllib.parse.unquote_plus
+    unquote_to_bytes = urllib.parse.unquote_to_bytes
 else:
     if sys.platform == "java":
         # Jython always uses 32 bits.
@@ -51,6 +53,25 @@ else:
 
     import urllib
     unquote_plus = urllib.unquote_plus
+    unquote_to_bytes = urllib.unquote
+
+
+def unquote_plus_bytes(b):
+    # Percent escapes are decoded with the quoted-printable decoder, which
+    # is implemented in C. Each valid escape shrinks output by two bytes, so
+    # input with malformed escapes is detected by output length and goes
+    # through the generic unquote. Line breaks have special meaning for
+    # quoted-printable, so such input is not accepted either.
+    b = b.replace(b'+', b' ')
+
+    if b'\n' not in b and b'\r' not in b:
+        qp = b.replace(b'=', b'=3D').replace(b'%', b'=')
+        result = binascii.a2b_qp(qp)
+
+        if len(result) == len(qp) - 2 * qp.count(b'='):
+            return result
+
+    return unquote_to_bytes(b)
 
 
 def asynchronous(method):
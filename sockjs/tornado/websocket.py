@@ -1,17 +1,190 @@
+import zlib
+import struct
+
 import tornado
 from tornado import escape, gen, websocket
 
+from sockjs.tornado.util import str_to_bytes
+
 try:
     from urllib.parse import urlparse # py3
 except ImportError:
     from urlparse import urlparse # py2
 
 
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+
+# permessage-deflate compressed frame flag
+RSV1 = 0x40
+
+
+def make_frame(message, opcode=OPCODE_TEXT, compressed=False):
+    """Build unmasked websocket frame. Server frames are not masked, so same
+    frame can be written to any number of connections.
+
+    `message`
+        Frame payload
+    `opcode`
+        Frame opcode
+    `compressed`
+        Set if payload was compressed with permessage-deflate
+    """
+    data = str_to_bytes(message)
+    data_len = len(data)
+
+    flags = 0x80 | opcode
+    if compressed:
+        flags |= RSV1
+
+    if data_len < 126:
+        header = struct.pack('BB', flags, data_len)
+    elif data_len <= 0xFFFF:
+        header = struct.pack('!BBH', flags, 126, data_len)
+    else:
+        header = struct.pack('!BBQ', flags, 127, data_len)
+
+    return header + data
+
+
+def _deflate(data, level, mem_level, wbits):
+    """Compress message with a new permessage-deflate context"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -wbits, mem_level)
+    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    # Trailing 0x00 0x00 0xff 0xff is implied by the extension
+    return data[:-4]
+
+
+class PreparedMessage(object):
+    """Message prepared for sending to many websocket connections.
+
+    Uncompressed frame is built once. For connections which negotiated
+    permessage-deflate without server context takeover, compressed output
+    depends only on the compression parameters, so message is compressed
+    once per distinct parameter set.
+    """
+    def __init__(self, message, opcode=OPCODE_TEXT):
+        """Constructor.
+
+        `message`
+            Message payload
+        `opcode`
+            Frame opcode
+        """
+        self.message = str_to_bytes(message)
+        self.opcode = opcode
+
+        self._frame = None
+        self._compressed = dict()
+
+    @property
+    def frame(self):
+        """Uncompressed frame"""
+        if self._frame is None:
+            self._frame = make_frame(self.message, self.opcode)
+        return self._frame
+
+    def get_compressed(self, level, mem_level, wbits):
+        """Return compressed frame and compressed payload size for the
+        compression parameters.
+
+        `level`
+            zlib compression level
+        `mem_level`
+            zlib memory level
+        `wbits`
+            Window size, in bits
+        """
+        key = (level, mem_level, wbits)
+
+        result = self._compressed.get(key)
+        if result is None:
+            data = _deflate(self.message, level, mem_level, wbits)
+            result = self._compressed[key] = (make_frame(data, self.opcode, compressed=True),
+                                              len(data))
+        return result
+
+
+# Tornado hook used to apply no-context-takeover settings
+NO_CONTEXT_TAKEOVER_SUPPORTED = hasattr(websocket.WebSocketProtocol13, '_create_compressors')
+
+
+class DeflateProtocol(websocket.WebSocketProtocol13):
+    """Tornado websocket protocol which adds no-context-takeover parameters
+    from the router settings to the accepted permessage-deflate extension.
+    Server is allowed to add both of them to its response, even if client did
+    not offer them.
+
+    Tornado has no public API for this, so `_create_compressors` is extended.
+    Tornado encodes the same parameters dictionary into the response header.
+    """
+    def _create_compressors(self, side, agreed_parameters, *args, **kwargs):
+        if side == 'server':
+            self.handler.on_deflate_accepted(agreed_parameters)
+
+        super(DeflateProtocol, self)._create_compressors(side, agreed_parameters,
+                                                         *args, **kwargs)
+
+
 class SockJSWebSocketHandler(websocket.WebSocketHandler):
-    if tornado.version_info[0] == 4 and tornado.version_info[1] > 1:
-        def get_compression_options(self):
-            # let tornado use compression when Sec-WebSocket-Extensions:permessage-deflate is provided
-            return {}
+    # Set once permessage-deflate was accepted for the connection
+    deflate = False
+    # Compression level, memory level and window bits of the server side
+    # compressor if it works without context takeover, None otherwise
+    deflate_params = None
+
+    def get_compression_options(self):
+        settings = self.server.settings
+
+        enabled = settings['websocket_compression']
+        if enabled is None:
+            # Compression was always enabled for Tornado 4.2+ 4.x releases
+            enabled = tornado.version_info[0] == 4 and tornado.version_info[1] > 1
+
+        if not enabled:
+            return None
+
+        # let tornado use compression when Sec-WebSocket-Extensions:permessage-deflate is provided
+        return dict(compression_level=settings['websocket_compression_level'],
+                    mem_level=settings['websocket_compression_mem_level'])
+
+    @property
+    def max_message_size(self):
+        limit = self.server.settings['max_message_size']
+        if limit is None:
+            return super(SockJSWebSocketHandler, self).max_message_size
+
+        return limit
+
+    def get_websocket_protocol(self):
+        protocol = super(SockJSWebSocketHandler, self).get_websocket_protocol()
+
+        if isinstance(protocol, websocket.WebSocketProtocol13):
+            protocol.__class__ = DeflateProtocol
+
+        return protocol
+
+    def on_deflate_accepted(self, params):
+        """Called by `DeflateProtocol` when permessage-deflate was accepted.
+        Adds configured no-context-takeover parameters.
+
+        `params`
+            Accepted extension parameters
+        """
+        settings = self.server.settings
+
+        if settings['websocket_server_no_context_takeover']:
+            params['server_no_context_takeover'] = None
+        if settings['websocket_client_no_context_takeover']:
+            params['client_no_context_takeover'] = None
+
+        self.deflate = True
+
+        if 'server_no_context_takeover' in params:
+            wbits = params.get('server_max_window_bits')
+            self.deflate_params = (settings['websocket_compression_level'],
+                                   settings['websocket_compression_mem_level'],
+                                   int(wbits) if wbits else zlib.MAX_WBITS)
 
     def check_origin(self, origin):
         # let tornado first check if connection from the same domain
@@ -29,6 +202,97 @@ class SockJSWebSocketHandler(websocket.WebSocketHandler):
             origin = origin.lower()
             return origin in allow_origin
 
+    def write_frame(self, prepared):
+        """Write `PreparedMessage` directly to the stream. Returns write
+        Future or None if connection can not accept prepared frames, for
+        example when compression context is kept between messages.
+
+        `prepared`
+            `PreparedMessage` instance
+        """
+        if not self._can_write_stream():
+            return None
+
+        stream = self.ws_connection.stream
+
+        # permessage-deflate allows uncompressed messages, so prepared frame
+        # is fine for small messages
+        size = len(prepared.message)
+        if not self.deflate:
+            return stream.write(prepared.frame)
+
+        if size < self.server.settings['websocket_compression_min_size']:
+            self.server.stats.on_bytes_compressed(self.name, size, size)
+            return stream.write(prepared.frame)
+
+        # Compressor without context takeover creates new zlib context for
+        # each message, so output is same for all connections which
+        # negotiated same parameters
+        if self.deflate_params is None:
+            return None
+
+        frame, compressed_size = prepared.get_compressed(*self.deflate_params)
+
+        self.server.stats.on_bytes_compressed(self.name, size, compressed_size)
+
+        return stream.write(frame)
+
+    def write_data(self, data, binary=False):
+        """Send message to the client. Returns tuple of write Future and
+        number of bytes written.
+
+        Number of bytes is the encoded payload size before compression.
+
+        If permessage-deflate was negotiated, messages shorter than
+        `websocket_compression_min_size` setting are sent uncompressed.
+        Tornado compresses all messages, so these are written to the stream
+        directly. Everything else goes through `write_message`.
+
+        `data`
+            Message to send
+        `binary`
+            Send message as binary frame
+        """
+        # Same as `write_message`, raw websocket sessions can send dicts
+        if isinstance(data, dict):
+            data = escape.json_encode(data)
+
+        data = str_to_bytes(data)
+        size = len(data)
+
+        if (not self.deflate
+                or size >= self.server.settings['websocket_compression_min_size']
+                or not self._can_write_stream()):
+            return self.write_message(data, binary), size
+
+        frame = make_frame(data, OPCODE_BINARY if binary else OPCODE_TEXT)
+
+        self.server.stats.on_bytes_compressed(self.name, size, size)
+
+        return self.ws_connection.stream.write(frame), size
+
+    def _can_write_stream(self):
+        """Check if frames can be written to the connection stream directly"""
+        ws = self.ws_connection
+        if ws is None or ws.client_terminated or ws.server_terminated:
+            return False
+
+        stream = getattr(ws, 'stream', None)
+        return stream is not None and not stream.closed()
+
+    def track_write(self, f, size):
+        """Report amount of data sitting in the stream buffer to the session
+
+        `f`
+            Write Future
+        `size`
+            Amount of bytes written
+        """
+        session = self.session
+        if f is not None and session is not None and session.tracks_buffer:
+            session.on_buffered(size)
+            f.add_done_callback(lambda f: session.on_written(size))
+
     def abort_connection(self):
         if self.ws_connection:
             self.ws_connection._abort()
@@ -61,4 +325,10 @@ class SockJSWebSocketHandler(websocket.WebSocketHandler):
             self.finish("\"Connection\" must be \"Upgrade\".")
             return
 
+        # Refuse new session before upgrade if server is overloaded
+        admission = self.server.admission
+        if admission.check(self.request.remote_ip) is not None:
+            admission.reject(self)
+            return
+
         yield super(SockJSWebSocketHandler, self)._execute(transforms, *args, **kwargs)